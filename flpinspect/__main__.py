@@ -1,10 +1,37 @@
 import argparse
+import logging
 
-from .constants import HTIP_MAX, EP_MAX
+from .constants import DEFAULT_INDEX, HTIP_MAX, EP_MAX
+from .index import Index
 from .inspector import FLPInspector
+from .server import serve
 from .treeview import Treeview
 
 
+def index(args):
+    def progress(result: dict):
+        if result.get("unchanged"):
+            return
+        status = f"FAILED ({result['error']})" if result.get("error") else "OK"
+        print(f"{result['path']}: {status}")
+
+    with Index(args.db) as idx:
+        indexed, skipped = idx.update(args.paths, args.jobs, progress)
+    print(f"Indexed {indexed} files, {skipped} already up to date")
+
+
+def query(args):
+    with Index(args.db) as idx:
+        if args.plugin:
+            paths = idx.with_plugin(args.plugin)
+        else:
+            paths = idx.with_event(args.event, args.value)
+    for path in paths:
+        print(path)
+    if args.open and paths:
+        FLPInspector(paths[0], args.verbose, args.db)
+
+
 def main():
     arg_parser = argparse.ArgumentParser(prog="flpinspect", description=__doc__)
     arg_parser.add_argument("--flp", help="The FLP to open in event viewer.")
@@ -21,10 +48,103 @@ def main():
         "and not show a warning when trying to edit cells containing text of "
         f"more than {EP_MAX} characters",
     )
+    arg_parser.add_argument(
+        "--index",
+        default=DEFAULT_INDEX,
+        help=f"Database used by File -> Open from index. Default: {DEFAULT_INDEX}",
+    )
+    subparsers = arg_parser.add_subparsers(dest="command")
+
+    # flpinspect index
+    index_parser = subparsers.add_parser(
+        "index", help="Index FLPs into a database which can be queried."
+    )
+    index_parser.add_argument(
+        "paths", nargs="+", help="FLPs, ZIP looped packages or folders to index."
+    )
+    index_parser.add_argument(
+        "--db", default=DEFAULT_INDEX, help=f"Database file. Default: {DEFAULT_INDEX}"
+    )
+    index_parser.add_argument(
+        "-j", "--jobs", type=int, help="Number of worker processes to parse with."
+    )
+
+    # flpinspect query
+    query_parser = subparsers.add_parser(
+        "query", help="Find indexed projects using a plugin or containing an event."
+    )
+    query_parser.add_argument(
+        "--db", default=DEFAULT_INDEX, help=f"Database file. Default: {DEFAULT_INDEX}"
+    )
+    what = query_parser.add_mutually_exclusive_group(required=True)
+    what.add_argument(
+        "--plugin", help="Name of a stock or VST/AU plugin, e.g. Sytrus or Serum."
+    )
+    what.add_argument("--event", type=int, help="ID of an event.")
+    query_parser.add_argument(
+        "--value", help="Value of the event, as shown in the Event View."
+    )
+    query_parser.add_argument(
+        "--open",
+        action="store_true",
+        help="Open the first result in the GUI, which then uses this database.",
+    )
+
+    # flpinspect serve
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve events of projects over a local HTTP/JSON API."
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="Default: %(default)s"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8765, help="Default: %(default)s"
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of threads serving requests. Default: %(default)s",
+    )
+    serve_parser.add_argument(
+        "--cache-items",
+        type=int,
+        default=16,
+        help="Maximum number of projects kept loaded. Default: %(default)s",
+    )
+    serve_parser.add_argument(
+        "--cache-mb",
+        type=int,
+        default=512,
+        help="Approximate memory limit for loaded projects. Default: %(default)s",
+    )
+    serve_parser.add_argument(
+        "--root", help="If set, only projects inside this folder can be opened."
+    )
+
     args = arg_parser.parse_args()
     if args.allow_unsafe:
         Treeview.allow_unsafe = True
-    FLPInspector(args.flp, args.verbose)
+    if args.command == "index":
+        index(args)
+    elif args.command == "query":
+        query(args)
+    elif args.command == "serve":
+        level = logging.DEBUG if args.verbose else logging.INFO
+        # Does nothing if PyFLP has already configured logging on import,
+        # the level of FLPInspect's own loggers is set regardless
+        logging.basicConfig(level=level)
+        logging.getLogger("flpinspect").setLevel(level)
+        serve(
+            args.host,
+            args.port,
+            args.workers,
+            args.cache_items,
+            args.cache_mb,
+            args.root,
+        )
+    else:
+        FLPInspector(args.flp, args.verbose, args.index)
 
 
 if __name__ == "__main__":
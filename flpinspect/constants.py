@@ -1,5 +1,7 @@
 """Constants required by child widgets of FLPInspector."""
 
+import pathlib
+
 # Treeview column widths
 COL0_WIDTH = 20
 INDEXCOL_WIDTH = 60
@@ -15,3 +17,14 @@ HTIP_MAX = 1000
 
 # Entry popup length limits
 EP_MAX = HTIP_MAX
+
+# Default location of the project index database
+DEFAULT_INDEX = pathlib.Path.home() / ".flpinspect" / "index.sqlite3"
+
+# Workspace: size of the shared parse worker pool and the number of
+# documents which keep their rows in Tk widgets; others are released
+PARSE_WORKERS = 2
+MAX_MATERIALIZED = 3
+
+# Interval (ms) at which background work is polled from the Tk mainloop
+POLL_INTERVAL = 50
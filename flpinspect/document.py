@@ -0,0 +1,381 @@
+"""Views of a single project, shown as a tab in the FLPInspect workspace."""
+
+import queue
+import tkinter as tk
+from tkinter import ttk, messagebox
+from concurrent.futures import Executor
+from typing import List
+
+from pyflp.utils import DATA_TEXT_EVENTS
+
+from .constants import (
+    COL0_WIDTH,
+    EVENTCOL_WIDTH,
+    INDEXCOL_WIDTH,
+    POLL_INTERVAL,
+    SB_DEFAULT,
+    VALUECOL_WIDTH,
+)
+from .store import EventStore, event_value
+from .treeview import Treeview
+from .validator import Finding, validate
+from . import writer
+
+
+class Document(ttk.Frame):
+    """Event View, Channels, Patterns, Arrangements and Validation
+    findings of an `EventStore`.
+
+    The widgets can be emptied with `release()` while the store is kept;
+    `materialize()` fills them again from the store.
+    """
+
+    def __init__(self, parent: ttk.Notebook, store: EventStore, sb: tk.Label):
+        super().__init__(parent)
+        self.store = store
+        self.sb = sb
+        self.loaded = self.failed = self.materialized = False
+        self.findings: List[Finding] = []
+        self.filter = "Unfiltered"  # Event ID shown in Event View
+        self.__poll_id = ""
+
+        self.nb = ttk.Notebook(self)
+
+        # Clear stale status when tab is changed
+        self.nb.bind("<<NotebookTabChanged>>", lambda _: self.sb.configure(text=""))
+
+        # Event View frame
+        self.ef = ttk.Frame(self.nb)
+
+        # Treeview
+        self.etv = Treeview(self.ef, columns=("#1", "#2", "#3"), show="tree headings")
+        self.etv.column("#0", minwidth=COL0_WIDTH, width=COL0_WIDTH, stretch=False)
+        self.etv.column("#1", width=INDEXCOL_WIDTH, anchor="w", stretch=False)
+        self.etv.heading("#1", text="Index", sort_by="index")
+        self.etv.column("#2", width=EVENTCOL_WIDTH, anchor="w", stretch=False)
+        self.etv.heading("#2", text="Event", sort_by="event")
+        self.etv.column("#3", width=VALUECOL_WIDTH, anchor="w", stretch=False)
+        self.etv.heading("#3", text="Value")
+        self.etv.pack(side="bottom", expand=tk.TRUE, fill="both")
+
+        # Search combobox
+        self.ecb = ttk.Combobox(self.ef)
+        self.ecb.bind("<<ComboboxSelected>>", self.tv_filter)
+        self.ecb.pack(side="top", fill="x", padx=3, pady=3)
+
+        # Add 'Event View' frame
+        self.nb.add(self.ef, text="Event View")
+
+        # Notebook -> 'Channels' Listbox
+        self.cf = ttk.Frame(self.nb)
+        self.clb = tk.Listbox(
+            self.cf, relief="flat", activestyle="none", selectmode="extended"
+        )
+        cvsb = ttk.Scrollbar(self.cf, orient="vertical", command=self.clb.yview)
+        cvsb.pack(side="right", fill="y")
+        chsb = ttk.Scrollbar(self.cf, orient="horizontal", command=self.clb.xview)
+        chsb.pack(side="bottom", fill="x")
+        self.clb.pack(expand=tk.TRUE, fill="both")
+        self.clb.configure(xscrollcommand=chsb.set, yscrollcommand=cvsb.set)
+        self.nb.add(self.cf, text="Channels")
+
+        # Notebook ->'Patterns' listbox
+        self.pf = ttk.Frame(self.nb)
+        self.plb = tk.Listbox(
+            self.pf, relief="flat", activestyle="none", selectmode="extended"
+        )
+        pvsb = ttk.Scrollbar(self.pf, orient="vertical", command=self.plb.yview)
+        pvsb.pack(side="right", fill="y")
+        phsb = ttk.Scrollbar(self.pf, orient="horizontal", command=self.plb.xview)
+        phsb.pack(side="bottom", fill="x")
+        self.plb.pack(expand=tk.TRUE, fill="both")
+        self.plb.configure(xscrollcommand=phsb.set, yscrollcommand=pvsb.set)
+        self.nb.add(self.pf, text="Patterns")
+
+        # Notebook ->'Arrangements' treeview
+        self.af = ttk.Frame(self.nb)
+        self.atv = Treeview(self.af, selectmode="extended", show="tree")
+        self.atv.pack(expand=tk.TRUE, fill="both")
+        self.nb.add(self.af, text="Arrangements")
+
+        # Notebook -> 'Validation' treeview, findings of `validator`
+        self.vf = ttk.Frame(self.nb)
+        self.vtv = ttk.Treeview(
+            self.vf, columns=("#1", "#2", "#3", "#4"), show="headings"
+        )
+        for col, text, width in (
+            ("#1", "Level", INDEXCOL_WIDTH),
+            ("#2", "Index", INDEXCOL_WIDTH),
+            ("#3", "Offset", INDEXCOL_WIDTH),
+            ("#4", "Finding", VALUECOL_WIDTH),
+        ):
+            self.vtv.heading(col, text=text, anchor="w")
+            self.vtv.column(col, width=width, anchor="w", stretch=col == "#4")
+        for level, color in (
+            ("INFO", "black"),
+            ("WARNING", "orange"),
+            ("ERROR", "red"),
+        ):
+            self.vtv.tag_configure(level, foreground=color)
+        vvsb = ttk.Scrollbar(self.vf, orient="vertical", command=self.vtv.yview)
+        vvsb.pack(side="right", fill="y")
+        self.vtv.pack(expand=tk.TRUE, fill="both")
+        self.vtv.configure(yscrollcommand=vvsb.set)
+
+        # Double-click a finding to select its event in Event View
+        self.vtv.bind("<Double-1>", self.goto_finding)
+        self.nb.add(self.vf, text="Validation")
+
+        # Pack notebook
+        self.nb.pack(fill="both", expand=tk.TRUE)
+        self.nb.enable_traversal()
+
+    def apply_edits(self) -> List[str]:
+        """Dumps values edited in the Event View into their events.
+
+        Returns:
+            Errors for values which couldn't be converted; those rows
+            are left as they are.
+        """
+        errors = []
+        for child in sorted(self.etv.edited, key=lambda c: int(self.etv.set(c, "#1"))):
+            # Raw strings; `item(..., "values")` would convert e.g. "007" to 7
+            index, value = self.etv.set(child, "#1"), self.etv.set(child, "#3")
+            ev = self.store.events[int(index)]
+            try:
+                if ev.id >= 208 and ev.id not in DATA_TEXT_EVENTS:
+                    # "(100, 200)" -> b'd\xc8'
+                    buf = bytes(map(int, value.strip("()").split(", ")))
+                elif ev.id in range(192, 208) or ev.id in DATA_TEXT_EVENTS:
+                    buf = value
+                elif ev.id <= 192:
+                    arr = str(value).split("/")
+                    assert len(arr) <= 2
+                    positive_value_idx = 1 if len(arr) == 2 else 0
+                    buf = int(arr[positive_value_idx].strip())
+                self.store.dump(ev, buf)
+            except Exception as e:
+                errors.append(f"Invalid value for event {index} ({ev.id}): {e}")
+            else:
+                self.etv.edited.discard(child)
+                self.etv.set(child, "#3", event_value(ev, self.store.unicode))
+        return errors
+
+    def tv_filter(self, _=None) -> bool:
+        """Shows only events of the ID selected in the filter combobox.
+
+        Like `release()`, refuses if edits can't be dumped, as the rows
+        holding them would be lost; the errors are shown and the current
+        filter is kept. Returns whether the filter was applied.
+        """
+        errors = self.apply_edits()
+        if errors:
+            self.ecb.set(self.filter)
+            messagebox.showerror(
+                "Filter", "Fix these values before filtering:\n\n" + "\n".join(errors)
+            )
+            return False
+        filter = self.ecb.get()
+        self.etv.delete(*self.etv.get_children())
+        self.etv.edited.clear()
+        for row in self.store.rows(None if filter == "Unfiltered" else filter):
+            self.etv.insert("", "end", values=row)
+        self.filter = filter
+        return True
+
+    def update_status(self, event: tk.Event):
+        """Status bar management"""
+        page: str = self.nb.select()
+
+        def sb_config(lb: tk.Listbox, prop: str):
+            sel = lb.curselection()
+            if len(sel) == 1:
+                idx = sel[0]
+                obj = getattr(self.store.project, prop)[idx]
+                text = repr(obj)
+                self.sb.config(text=text)
+            else:
+                prop_singular = prop[:-1]  # objects -> object
+                self.sb.config(text=SB_DEFAULT % prop_singular)
+
+        if page == str(self.ef):
+            if (
+                event.widget is self.etv
+                and self.etv.identify_region(event.x, event.y) == "cell"
+            ):
+                row = self.etv.identify_row(event.y)
+                index = self.etv.item(row, "values")[0]
+                self.sb.config(text=self.store.describe(self.store.events[int(index)]))
+        elif page == str(self.cf):
+            sb_config(self.clb, "channels")
+        elif page == str(self.pf):
+            sb_config(self.plb, "patterns")
+        elif page == str(self.af):
+            self.sb.config(text="")
+
+    def populate_etv(self):
+        """Populates the event treeview."""
+        for row in self.store.rows():
+            self.etv.insert("", "end", values=row)
+
+        # Populate the filter with event types
+        self.etv_filters = ["Unfiltered"] + self.store.ids()
+        self.ecb.configure(values=self.etv_filters)
+
+        # Selects "Unfiltered" by default
+        self.ecb.current(0)
+        self.filter = "Unfiltered"
+
+    def populate(self):
+        project = self.store.project
+
+        def clb():
+            """Populate 'Channels' listbox."""
+            for ch in project.channels:
+                name = None
+                if ch.name:
+                    name = ch.name
+                elif ch.default_name:
+                    name = ch.default_name
+                self.clb.insert("end", name)
+
+        def plb():
+            """Populate 'Patterns' listbox."""
+            for pat in project.patterns:
+                self.plb.insert("end", pat.name)
+
+        def atv():
+            """Populate 'Arrangements' tab treeview."""
+            for arr in project.arrangements:
+                arr_iid = self.atv.insert("", "end", text=arr.name, open=True)
+                tm_iid = self.atv.insert(arr_iid, "end", text="TimeMarkers", open=True)
+                for tm in arr.timemarkers:
+                    tmn = (tm.name,)
+                    if tm.name is None:
+                        tmn = f"TimeMarker @ {tm.position}"
+                    self.atv.insert(tm_iid, "end", text=tmn)
+                tr_iid = self.atv.insert(arr_iid, "end", text="Tracks", open=True)
+                for tr in arr.tracks:
+                    trn = (tr.name,)
+                    if tr.name is None:
+                        trn = (f"Track {tr.index}",)
+                    self.atv.insert(tr_iid, "end", text=trn)
+
+        if self.loaded:
+            self.populate_etv()
+        if project:
+            clb()
+            plb()
+            atv()
+        else:
+            # Remove extra tabs
+            # * Technically I can still, provide these infos
+            # * but that better be done in PyFLP itself.
+            frames = [self.cf, self.pf, self.af]
+            if not self.loaded:
+                # Not even events could be read, only findings remain
+                frames.append(self.ef)
+            for frame in frames:
+                if str(frame) in self.nb.tabs():
+                    self.nb.forget(frame)
+        for finding in self.findings:
+            self.insert_finding(finding)
+        self.materialized = True
+
+    def materialize(self):
+        """Fills the views from the store, if they were released."""
+        if (self.loaded or self.failed) and not self.materialized:
+            self.populate()
+
+    def validate(self, pool: Executor):
+        """Runs `validator` over the file in `pool`; findings are
+        streamed into the 'Validation' tab as they are found."""
+        findings: queue.Queue = queue.Queue()
+
+        def work():
+            try:
+                for finding in validate(self.store.file):
+                    findings.put(finding)
+            finally:
+                findings.put(None)
+
+        pool.submit(work)
+        self.__poll_id = self.after(POLL_INTERVAL, self.__poll_findings, findings)
+
+    def __poll_findings(self, findings: queue.Queue):
+        self.__poll_id = ""
+        done = False
+        while not findings.empty():
+            finding = findings.get_nowait()
+            if finding is None:
+                done = True
+                break
+            self.findings.append(finding)
+            if self.materialized:
+                self.insert_finding(finding)
+
+        text = f"Validation ({len(self.findings)})" if self.findings else "Validation"
+        self.nb.tab(self.vf, text=text)
+        if not done:
+            self.__poll_id = self.after(POLL_INTERVAL, self.__poll_findings, findings)
+
+    def destroy(self):
+        # The callback is deleted along with the widget, Tk would fail calling it
+        if self.__poll_id:
+            self.after_cancel(self.__poll_id)
+            self.__poll_id = ""
+        super().destroy()
+
+    def insert_finding(self, f: Finding):
+        index = "" if f.index is None else f.index
+        self.vtv.insert(
+            "", "end", values=(f.level, index, f.offset, f.message), tags=(f.level,)
+        )
+
+    def goto_finding(self, _=None):
+        """Selects the event of the focused finding in Event View."""
+        values = self.vtv.item(self.vtv.focus(), "values")
+        if not values or values[1] == "" or not self.loaded:
+            return
+        index = int(values[1])
+        if self.filter != "Unfiltered":
+            self.ecb.current(0)
+            if not self.tv_filter():
+                return
+        for child in self.etv.get_children():
+            if int(self.etv.item(child, "values")[0]) == index:
+                self.nb.select(self.ef)
+                self.etv.selection_set(child)
+                self.etv.see(child)
+                break
+
+    def release(self) -> bool:
+        """Empties the views to free Tk's memory, keeping the store.
+
+        Edits made in the Event View are dumped to the store first; if
+        any of them can't be, nothing is released and False is returned.
+        """
+        if not self.materialized:
+            return True
+        if self.apply_edits():
+            return False
+        self.etv.close_popup()
+        self.etv.delete(*self.etv.get_children())
+        self.etv.edited.clear()
+        self.atv.delete(*self.atv.get_children())
+        self.clb.delete(0, "end")
+        self.plb.delete(0, "end")
+        self.vtv.delete(*self.vtv.get_children())
+        self.materialized = False
+        return True
+
+    def save_as(self, file: str, verify: bool = True):
+        """Saves the project, including edits, to `file`.
+
+        Raises:
+            ValueError: If an edited value is invalid or verification fails.
+        """
+        errors = self.apply_edits()
+        if errors:
+            raise ValueError("\n".join(errors))
+        writer.save(self.store.file, self.store.events, file, verify)
@@ -9,31 +9,46 @@ Attributions:
 """
 
 import logging
+import queue
 from tkinter.scrolledtext import ScrolledText
 
 
 class GUIHandler(logging.Handler):
-    """Used to redirect logging output to a `tk.ScrolledText` widget."""
+    """Used to redirect logging output to a `tk.ScrolledText` widget.
+
+    Records can be emitted from any thread; they are queued and
+    written to the console from the Tk mainloop.
+    """
+
+    POLL_INTERVAL = 100  # ms
 
     def __init__(self, console: ScrolledText):
         logging.Handler.__init__(self)
         self.console = console
+        self.queue: queue.Queue = queue.Queue()
         self.console.tag_config("INFO", foreground="black")
         self.console.tag_config("DEBUG", foreground="grey")
         self.console.tag_config("WARNING", foreground="orange")
         self.console.tag_config("ERROR", foreground="red")
         self.console.tag_config("CRITICAL", foreground="red", underline=1)
+        self.console.after(self.POLL_INTERVAL, self.poll)
 
     def format(self, record: logging.LogRecord):
         r = record
         return f"[{r.levelname}] {r.name} <{r.module}.{r.funcName}>  {r.message}"
 
     def emit(self, record: logging.LogRecord):
-        formattedMessage = self.format(record) + "\n"
-        self.console.configure(state="normal")  # Enable writing
-        self.console.insert(
-            "end", formattedMessage, record.levelname
-        )  # Write from the end
-        self.console.configure(state="disabled")  # Disable writing
-        self.console.see("end")  # Move cursor to the end
-        self.console.update()
+        self.queue.put((self.format(record) + "\n", record.levelname))
+
+    def poll(self):
+        """Writes queued records to the console."""
+        if not self.queue.empty():
+            self.console.configure(state="normal")  # Enable writing
+            while not self.queue.empty():
+                formattedMessage, level = self.queue.get_nowait()
+                self.console.insert(
+                    "end", formattedMessage, level
+                )  # Write from the end
+            self.console.configure(state="disabled")  # Disable writing
+            self.console.see("end")  # Move cursor to the end
+        self.console.after(self.POLL_INTERVAL, self.poll)
@@ -0,0 +1,422 @@
+"""
+Incremental SQLite index of a library of FLPs.
+
+Files are parsed in a process pool and a summary of their events, channels,
+patterns and arrangements is written to a local SQLite database. Re-runs only
+parse files whose modification time and size changed and whose hash differs
+from the one stored in the database.
+"""
+
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pyflp.event import DataEvent, Event
+from pyflp.flobject import ChannelEvent, InsertEvent, InsertSlotEvent
+
+from .constants import DEFAULT_INDEX
+from .store import EventStore, event_value
+
+SUFFIXES = (".flp", ".zip")
+
+# Bumped whenever SCHEMA changes; older databases are rebuilt from scratch
+SCHEMA_VERSION = 2
+
+TABLES = ("files", "events", "channels", "slots", "patterns", "arrangements")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    version TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    event_id INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT,
+    plugin TEXT,
+    plugin_path TEXT
+);
+CREATE TABLE IF NOT EXISTS slots (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    insert_idx INTEGER NOT NULL,
+    idx INTEGER,
+    name TEXT,
+    plugin TEXT,
+    plugin_path TEXT
+);
+CREATE TABLE IF NOT EXISTS patterns (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS arrangements (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT,
+    tracks INTEGER NOT NULL,
+    timemarkers INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_id_value ON events (event_id, value);
+CREATE INDEX IF NOT EXISTS events_file ON events (file_id);
+CREATE INDEX IF NOT EXISTS channels_plugin ON channels (plugin COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS channels_file ON channels (file_id);
+CREATE INDEX IF NOT EXISTS slots_plugin ON slots (plugin COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS slots_file ON slots (file_id);
+CREATE INDEX IF NOT EXISTS patterns_file ON patterns (file_id);
+CREATE INDEX IF NOT EXISTS arrangements_file ON arrangements (file_id);
+"""
+
+# Number of parsed files written to the database per transaction
+COMMIT_EVERY = 50
+
+# Default name of channels and insert slots hosting a VST/AU plugin
+WRAPPER = "Fruity Wrapper"
+
+# Plugin wrapper state: kinds holding VST chunks, and IDs of those chunks
+VST_KINDS = (8, 10)
+VST_NAME, VST_PATH = 54, 55
+
+
+def sha1sum(path: str) -> str:
+    """Hashes a file in chunks, so that large files aren't read at once."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def wrapped_plugin(data: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """Name and path of the VST/AU plugin in the data of a plugin event
+    of a channel or an insert slot hosting it in a 'Fruity Wrapper'.
+
+    PyFLP doesn't parse this for channels; for slots it reads the chunk
+    sizes as 32 bit and loses track after the first chunk.
+    """
+    name = path = None
+    if len(data) < 4 or struct.unpack_from("<i", data)[0] not in VST_KINDS:
+        return name, path
+    pos = 4
+    while pos + 12 <= len(data):
+        id, size = struct.unpack_from("<IQ", data, pos)
+        pos += 12
+        chunk = data[pos : pos + size]
+        pos += size
+        if id == VST_NAME:
+            name = chunk.decode("utf-8", "replace").rstrip("\0") or None
+        elif id == VST_PATH:
+            path = chunk.decode("utf-8", "replace").rstrip("\0") or None
+    if name is None and path is not None:
+        name = pathlib.PureWindowsPath(path).stem
+    return name, path
+
+
+def _plugins(events: List[Event], unicode: bool) -> Tuple[List[tuple], List[tuple]]:
+    """Rows of channels and insert slots with the plugin each one hosts.
+
+    Works on events rather than the `Project`, so that it works in
+    failsafe mode as well. The plugin is the stock plugin's name or, for
+    a 'Fruity Wrapper', the name of the plugin inside it.
+    """
+    channels: List[tuple] = []
+    slots: List[tuple] = []
+
+    # Channel or slot being walked; its events end at the next one
+    cur: Optional[dict] = None
+    insert = -1
+
+    def row(cur: dict) -> tuple:
+        plugin, path = cur["default"], None
+        if cur["data"] is not None and plugin == WRAPPER:
+            name, path = wrapped_plugin(cur["data"])
+            plugin = name or plugin
+        return (cur["idx"], cur["name"], plugin, path)
+
+    def flush():
+        if cur is not None and insert == -1:
+            channels.append(row(cur))
+
+    for ev in events:
+        id = int(ev.id)
+        if id == InsertEvent.Parameters:
+            flush()
+            cur = dict(idx=None, name=None, default=None, data=None)
+            insert += 1
+        elif insert == -1 and id == ChannelEvent.New:
+            flush()
+            idx = int.from_bytes(ev.data[:2], "little")
+            cur = dict(idx=idx, name=None, default=None, data=None)
+        elif cur is None:
+            continue
+        elif id == ChannelEvent.DefaultName:  # Same ID for slots
+            cur["default"] = event_value(ev, unicode) or None
+        elif id == ChannelEvent.Name:
+            cur["name"] = event_value(ev, unicode) or None
+        elif id == ChannelEvent.Plugin:
+            cur["data"] = ev.data
+        elif insert != -1 and id == InsertSlotEvent.Index:
+            cur["idx"] = int.from_bytes(ev.data[:2], "little")
+            if cur["default"] is not None:
+                slots.append((insert,) + row(cur))
+            cur = dict(idx=None, name=None, default=None, data=None)
+    flush()
+    return channels, slots
+
+
+def _scan(path: str, known_sha1: Optional[str]) -> dict:
+    """Runs in a worker process. Parses `path` and summarises it.
+
+    If the hash of the file matches `known_sha1`, the file is not parsed
+    again and only its new modification time and size are returned.
+    """
+    # PyFLP logs every unimplemented event; nobody reads worker output
+    logging.disable(logging.CRITICAL)
+
+    result = dict(
+        path=path,
+        mtime=0.0,
+        size=0,
+        sha1="",
+        version=None,
+        error=None,
+        events=[],
+        channels=[],
+        slots=[],
+        patterns=[],
+        arrangements=[],
+    )
+    try:
+        st = os.stat(path)
+        sha1 = sha1sum(path)
+    except OSError as e:
+        # Deleted or unreadable since it was found; indexed again next time
+        result["error"] = str(e)
+        return result
+    result.update(mtime=st.st_mtime, size=st.st_size, sha1=sha1)
+    if sha1 == known_sha1:
+        result["unchanged"] = True
+        return result
+
+    store = EventStore(path)
+    try:
+        store.load()
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+        return result
+    result["error"] = store.error
+    project = store.project
+
+    for ev in store.events:
+        value = None
+        if not isinstance(ev, DataEvent):
+            value = str(event_value(ev, store.unicode))
+            if int(ev.id) == 199:  # MiscEvent.Version
+                result["version"] = value.rstrip("\0")
+        result["events"].append((ev.index, int(ev.id), ev.size, value))
+
+    result["channels"], result["slots"] = _plugins(store.events, store.unicode)
+    if project is not None:
+        for idx, pat in enumerate(project.patterns):
+            result["patterns"].append((idx, pat.name))
+        for idx, arr in enumerate(project.arrangements):
+            result["arrangements"].append(
+                (idx, arr.name, len(arr.tracks), len(arr.timemarkers))
+            )
+    return result
+
+
+class Index:
+    """A SQLite database of FLP summaries.
+
+    Args:
+        db: Path to the database file; created if it doesn't exist.
+    """
+
+    def __init__(self, db=DEFAULT_INDEX):
+        self.db = pathlib.Path(db)
+        self.db.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Files are indexed again on the next update
+            for table in TABLES:
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @staticmethod
+    def discover(paths: Iterable[str]) -> List[str]:
+        """Expands directories in `paths` to the FLPs and ZIPs inside them."""
+        found = []
+        for p in map(pathlib.Path, paths):
+            if p.is_dir():
+                for f in p.rglob("*"):
+                    if f.suffix.lower() in SUFFIXES and f.is_file():
+                        found.append(str(f.resolve()))
+            elif p.suffix.lower() in SUFFIXES and p.is_file():
+                found.append(str(p.resolve()))
+        return found
+
+    def update(
+        self,
+        paths: Iterable[str],
+        jobs: Optional[int] = None,
+        progress: Optional[Callable[[dict], None]] = None,
+    ) -> Tuple[int, int]:
+        """Indexes FLPs found in `paths`, skipping the ones already up to date.
+
+        Args:
+            paths: FLPs, ZIP looped packages or directories containing them.
+            jobs: Number of worker processes, defaults to the CPU count.
+            progress: Called with the result of every scanned file.
+
+        Returns:
+            The number of files (re)indexed and the number of files skipped.
+        """
+        known: Dict[str, Tuple[float, int, str]] = {
+            path: (mtime, size, sha1)
+            for path, mtime, size, sha1 in self.conn.execute(
+                "SELECT path, mtime, size, sha1 FROM files"
+            )
+        }
+
+        todo: List[str] = []
+        hashes: List[Optional[str]] = []
+        skipped = 0
+        for path in self.discover(paths):
+            old = known.get(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                pass  # `_scan` records the error
+            else:
+                if old and old[0] == st.st_mtime and old[1] == st.st_size:
+                    skipped += 1
+                    continue
+            todo.append(path)
+            hashes.append(old[2] if old else None)
+
+        indexed = 0
+        if todo:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = pool.map(_scan, todo, hashes, chunksize=8)
+                for n, result in enumerate(results, 1):
+                    if result.get("unchanged"):
+                        skipped += 1
+                    else:
+                        indexed += 1
+                    self._store(result)
+                    if n % COMMIT_EVERY == 0:
+                        self.conn.commit()
+                    if progress:
+                        progress(result)
+        self.prune()
+        self.conn.commit()
+        return indexed, skipped
+
+    def _store(self, r: dict):
+        c = self.conn
+        if r.get("unchanged"):
+            c.execute(
+                "UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                (r["mtime"], r["size"], r["path"]),
+            )
+            return
+
+        c.execute("DELETE FROM files WHERE path = ?", (r["path"],))
+        cur = c.execute(
+            "INSERT INTO files (path, mtime, size, sha1, version, error) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (r["path"], r["mtime"], r["size"], r["sha1"], r["version"], r["error"]),
+        )
+        fid = cur.lastrowid
+        c.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+            ((fid,) + row for row in r["events"]),
+        )
+        c.executemany(
+            "INSERT INTO channels VALUES (?, ?, ?, ?, ?)",
+            ((fid,) + row for row in r["channels"]),
+        )
+        c.executemany(
+            "INSERT INTO slots VALUES (?, ?, ?, ?, ?, ?)",
+            ((fid,) + row for row in r["slots"]),
+        )
+        c.executemany(
+            "INSERT INTO patterns VALUES (?, ?, ?)",
+            ((fid,) + row for row in r["patterns"]),
+        )
+        c.executemany(
+            "INSERT INTO arrangements VALUES (?, ?, ?, ?, ?)",
+            ((fid,) + row for row in r["arrangements"]),
+        )
+
+    def prune(self):
+        """Removes entries of files which don't exist anymore."""
+        stale = [
+            (path,)
+            for (path,) in self.conn.execute("SELECT path FROM files")
+            if not os.path.exists(path)
+        ]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+
+    # * Queries
+    def with_plugin(self, plugin: str) -> List[str]:
+        """Paths of projects having a channel or an insert slot using
+        `plugin` (case-insensitive); the name of a stock plugin or of a
+        VST/AU plugin, as FL Studio shows it in the plugin database."""
+        return [
+            path
+            for (path,) in self.conn.execute(
+                "SELECT path FROM files WHERE id IN ("
+                "SELECT file_id FROM channels WHERE plugin = ?1 COLLATE NOCASE "
+                "UNION SELECT file_id FROM slots WHERE plugin = ?1 COLLATE NOCASE"
+                ") ORDER BY path",
+                (plugin,),
+            )
+        ]
+
+    def with_event(self, event_id: int, value: Optional[str] = None) -> List[str]:
+        """Paths of projects containing an event `event_id`.
+
+        Args:
+            event_id: The ID of the event.
+            value: If set, the event must have this value, as it is
+                displayed in the 'Value' column of Event View.
+        """
+        sql = (
+            "SELECT DISTINCT f.path FROM files f JOIN events e "
+            "ON e.file_id = f.id WHERE e.event_id = ?"
+        )
+        args: tuple = (event_id,)
+        if value is not None:
+            sql += " AND e.value = ?"
+            args += (value,)
+        return [path for (path,) in self.conn.execute(sql + " ORDER BY f.path", args)]
@@ -1,30 +1,27 @@
+import logging
 import pathlib
 import tkinter as tk
 from tkinter import ttk
 import tkinter.filedialog as tkfiledlg
 import tkinter.messagebox as tkmsgbox
 from tkinter.scrolledtext import ScrolledText
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
 
-from pyflp import Parser
-from pyflp.event import Event, ByteEvent, WordEvent, DWordEvent, TextEvent
-from pyflp.utils import DATA_TEXT_EVENTS
-
-from .constants import (
-    COL0_WIDTH,
-    EVENTCOL_WIDTH,
-    INDEXCOL_WIDTH,
-    SB_DEFAULT,
-    VALUECOL_WIDTH,
-)
+from .constants import DEFAULT_INDEX, MAX_MATERIALIZED, PARSE_WORKERS, POLL_INTERVAL
+from .document import Document
 from .gui_logger import GUIHandler  # type: ignore
-from .treeview import Treeview
+from .index import Index
+from .query_dialog import QueryDialog
+from .store import EventStore
 
 
 class FLPInspector(tk.Tk):
-    def __init__(self, flp: str = "", verbose: bool = True):
+    def __init__(self, flp: str = "", verbose: bool = True, index=DEFAULT_INDEX):
 
         # Init
         super().__init__()
+        self.index = pathlib.Path(index)
         self.title("FLPInspect")
         self.geometry("600x600")
         self.option_add("*tearOff", tk.FALSE)
@@ -44,6 +41,11 @@ class FLPInspector(tk.Tk):
         )
         self.bind("<Control-o>", self.file_open)
 
+        # File -> Open from index
+        self.m_file.add_command(
+            label="Open from index", command=self.file_open_indexed, underline=10
+        )
+
         # File -> Save
         self.m_file.add_command(
             label="Save as",
@@ -52,6 +54,17 @@ class FLPInspector(tk.Tk):
             underline=1,
             state="disabled",
         )
+        self.bind("<Control-s>", self.file_saveas)
+
+        # File -> Close
+        self.m_file.add_command(
+            label="Close",
+            command=self.file_close,
+            accelerator="Ctrl+W",
+            underline=0,
+            state="disabled",
+        )
+        self.bind("<Control-w>", self.file_close)
 
         # Menubar -> Preferences
         menu_prefs = tk.Menu(self.m)
@@ -88,90 +101,39 @@ class FLPInspector(tk.Tk):
         self.sb = tk.Label(bd=1, relief="sunken", anchor="s", height="1")
         self.sb.pack(side="bottom", fill="x")
 
-        # PanedWindow to split area between Notebook and ScrolledText
+        # PanedWindow to split area between documents and ScrolledText
         self.pw = tk.PanedWindow(bd=4, sashwidth=10, orient="vertical")
         self.pw.pack(fill="both", expand=tk.TRUE)
 
-        # PanedWindow -> Notebook
-        self.nb = ttk.Notebook(self.pw)
-
-        # Clear stale status when tab is changed
-        self.nb.bind("<<NotebookTabChanged>>", lambda _: self.sb.configure(text=""))
-
-        # Event View frame
-        self.ef = ttk.Frame(self.nb)
-
-        # Treeview
-        self.etv = Treeview(self.ef, columns=("#1", "#2", "#3"), show="tree headings")
-        self.etv.column("#0", minwidth=COL0_WIDTH, width=COL0_WIDTH, stretch=False)
-        self.etv.column("#1", width=INDEXCOL_WIDTH, anchor="w", stretch=False)
-        self.etv.heading("#1", text="Index", sort_by="index")
-        self.etv.column("#2", width=EVENTCOL_WIDTH, anchor="w", stretch=False)
-        self.etv.heading("#2", text="Event", sort_by="event")
-        self.etv.column("#3", width=VALUECOL_WIDTH, anchor="w", stretch=False)
-        self.etv.heading("#3", text="Value")
-        self.etv.pack(side="bottom", expand=tk.TRUE, fill="both")
-
-        # Search combobox
-        self.ecb = ttk.Combobox(self.ef)
-        self.ecb.bind("<<ComboboxSelected>>", self.tv_filter)
-        self.ecb.pack(side="top", fill="x", padx=3, pady=3)
-
-        # Add 'Event View' frame
-        self.nb.add(self.ef, text="Event View")
-
-        # Notebook -> 'Channels' Listbox
-        self.cf = ttk.Frame(self.nb)
-        self.clb = tk.Listbox(
-            self.cf, relief="flat", activestyle="none", selectmode="extended"
-        )
-        cvsb = ttk.Scrollbar(self.cf, orient="vertical", command=self.clb.yview)
-        cvsb.pack(side="right", fill="y")
-        chsb = ttk.Scrollbar(self.cf, orient="horizontal", command=self.clb.xview)
-        chsb.pack(side="bottom", fill="x")
-        self.clb.pack(expand=tk.TRUE, fill="both")
-        self.clb.configure(xscrollcommand=chsb.set, yscrollcommand=cvsb.set)
-        self.nb.add(self.cf, text="Channels")
-
-        # Notebook ->'Patterns' listbox
-        self.pf = ttk.Frame(self.nb)
-        self.plb = tk.Listbox(
-            self.pf, relief="flat", activestyle="none", selectmode="extended"
-        )
-        pvsb = ttk.Scrollbar(self.pf, orient="vertical", command=self.plb.yview)
-        pvsb.pack(side="right", fill="y")
-        phsb = ttk.Scrollbar(self.pf, orient="horizontal", command=self.plb.xview)
-        phsb.pack(side="bottom", fill="x")
-        self.plb.pack(expand=tk.TRUE, fill="both")
-        self.plb.configure(xscrollcommand=phsb.set, yscrollcommand=pvsb.set)
-        self.nb.add(self.pf, text="Patterns")
-
-        # Notebook ->'Arrangements' treeview
-        self.af = ttk.Frame(self.nb)
-        self.atv = Treeview(self.af, selectmode="extended", show="tree")
-        self.atv.pack(expand=tk.TRUE, fill="both")
-        self.nb.add(self.af, text="Arrangements")
-
-        # Pack notebook and panedwindow
-        self.nb.pack(fill="both", expand=tk.TRUE)
-        self.nb.enable_traversal()
-        self.pw.add(self.nb, height=400)
+        # PanedWindow -> Notebook, a tab for every open project
+        self.docs = ttk.Notebook(self.pw)
+        self.docs.bind("<<NotebookTabChanged>>", self.on_document_changed)
+        self.docs.pack(fill="both", expand=tk.TRUE)
+        self.pw.add(self.docs, height=400)
+
+        # Documents, least recently viewed first
+        self.documents: List[Document] = []
+
+        # Projects of all documents are parsed by a shared pool
+        self.pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Menubar -> View -> Tooltips
         self.__show_htips = tk.BooleanVar(value=False)  # !
         menu_view.add_checkbutton(
-            label="Tooltips", variable=self.__show_htips, command=self.etv.toggle_htips
+            label="Tooltips", variable=self.__show_htips, command=self.toggle_htips
         )
 
-        # ! Till the tooltips are a mess, disable theme by default
-        self.etv.toggle_htips()
-
         # Menubar -> Preferences -> Editable
         self.__editable = tk.BooleanVar(value=True)
         menu_prefs.add_checkbutton(
-            label="Editable", variable=self.__editable, command=self.etv.toggle_editing
+            label="Editable", variable=self.__editable, command=self.toggle_editing
         )
 
+        # Menubar -> Preferences -> Verify saves
+        self.__verify_saves = tk.BooleanVar(value=True)
+        menu_prefs.add_checkbutton(label="Verify saves", variable=self.__verify_saves)
+
         # ScrolledText to display Parser logs
         self.console = ScrolledText(self.pw, bg="#D3D3D3")
         self.console.pack(side="bottom")
@@ -199,80 +161,34 @@ class FLPInspector(tk.Tk):
             )
         else:
             self.title("FLPInspect (Verbose Mode)")
+
+            # Parser logs from all documents, written from worker threads
+            logging.root.addHandler(GUIHandler(self.console))
         self.console.configure(state="disabled")
 
         # If called with args from command line
         if flp:
-            self.populate(pathlib.Path(flp))
+            self.open_file(flp)
 
         self.mainloop()
 
-    @staticmethod
-    def get_event_value(ev: Event) -> str:
-        """The value to display in 'Value' column."""
-        if isinstance(ev, ByteEvent):
-            v = ev.to_int8()
-            if v < 0:
-                i8 = v
-                u8 = ev.to_uint8()
-                v = f"{i8} / {u8}"
-        elif isinstance(ev, WordEvent):
-            v = ev.to_int16()
-            if v < 0:
-                i16 = v
-                u16 = ev.to_uint16()
-                v = f"{i16} / {u16}"
-        elif isinstance(ev, DWordEvent):
-            v = ev.to_int32()
-            if v < 0:
-                i32 = v
-                u32 = ev.to_uint32()
-                v = f"{i32} / {u32}"
-        elif isinstance(ev, TextEvent):
-            v = ev.to_str()
-        else:
-            v = str(tuple(ev.data))
-        return v
-
-    def tv_filter(self, _=None):
-        filter = self.ecb.get()
-        self.etv.delete(*self.etv.get_children())
-        if filter == "Unfiltered":
-            for e in self.events:
-                v = self.get_event_value(e)
-                self.etv.insert("", "end", values=(e.index, e.id, v))
-            return
-        for e in self.events:
-            if str(e.id) == filter:
-                v = self.get_event_value(e)
-                self.etv.insert("", "end", values=(e.index, e.id, v))
+    @property
+    def current(self) -> Optional[Document]:
+        """The document whose tab is selected."""
+        selected = self.docs.select()
+        return self.nametowidget(selected) if selected else None
+
+    def console_write(self, text: str, tag: str = "INFO"):
+        self.console.configure(state="normal")
+        self.console.insert("end", text, tag)
+        self.console.configure(state="disabled")
+        self.console.see("end")
 
     def update_status(self, event: tk.Event):
         """Status bar management"""
-        page: str = self.nb.select()
-
-        def sb_config(lb: tk.Listbox, prop: str):
-            sel = lb.curselection()
-            if len(sel) == 1:
-                idx = sel[0]
-                obj = getattr(self.project, prop)[idx]
-                text = repr(obj)
-                self.sb.config(text=text)
-            else:
-                prop_singular = prop[:-1]  # objects -> object
-                self.sb.config(text=SB_DEFAULT % prop_singular)
-
-        if page == ".!panedwindow.!notebook.!frame":
-            if self.etv.identify_region(event.x, event.y) == "cell":
-                row = self.etv.identify_row(event.y)
-                index = self.etv.item(row, "values")[0]
-                self.sb.config(text=repr(self.events[int(index)]))
-        elif page == ".!panedwindow.!notebook.!frame2":
-            sb_config(self.clb, "channels")
-        elif page == ".!panedwindow.!notebook.!frame3":
-            sb_config(self.plb, "patterns")
-        elif page == ".!panedwindow.!notebook.!frame4":
-            self.sb.config(text="")
+        doc = self.current
+        if doc and doc.materialized:
+            doc.update_status(event)
 
     def toggle_console(self):
 
@@ -282,89 +198,115 @@ class FLPInspector(tk.Tk):
         else:
             self.pw.add(self.console)
 
-    def populate_etv(self):
-        """Populates the event treeview."""
-        self.etv_filters = set(["Unfiltered"])
-        for ev in self.events:
-            self.etv_filters.add(str(ev.id))
-            value = self.get_event_value(ev)
-            self.etv.insert("", "end", values=(ev.index, ev.id, value))
-
-        # Populate the filter with event types
-        self.ecb.configure(values=sorted(self.etv_filters, key=str))
-
-        # Selects "Unfiltered" by default
-        self.ecb.current(len(self.etv_filters) - 1)
-
-    def populate(self, file: pathlib.Path):
-        gui_handler = GUIHandler(self.console)
-        parser = Parser(verbose=self.verbose, handlers=[gui_handler])
-        self.project = None
-        if file.suffix == ".zip":
-            # TODO Parser.get_events for ZIPs
-            self.project = parser.parse_zip(file)
+    def toggle_htips(self):
+        for doc in self.documents:
+            doc.etv.htip.place_forget()
+            doc.etv.show_htips = self.__show_htips.get()
+
+    def toggle_editing(self):
+        for doc in self.documents:
+            doc.etv.editable = self.__editable.get()
+            doc.etv.close_popup()
+
+    def touch(self, doc: Document):
+        """Marks `doc` as most recently viewed. Releases the rows of least
+        recently viewed documents beyond `MAX_MATERIALIZED`."""
+        self.documents.remove(doc)
+        self.documents.append(doc)
+        materialized = [d for d in self.documents if d.materialized]
+        for old in materialized[: -MAX_MATERIALIZED or None]:
+            if old is not doc and not old.release():
+                self.console_write(
+                    f"\nKeeping {old.store.file.name} in memory; "
+                    "it has invalid edits.",
+                    "WARNING",
+                )
+
+    def on_document_changed(self, _=None):
+        self.sb.configure(text="")
+        doc = self.current
+        state = "normal" if doc and doc.loaded else "disabled"
+        self.m_file.entryconfigure("Save as", state=state)
+        self.m_file.entryconfigure("Close", state="normal" if doc else "disabled")
+        if doc is None:
+            self.title("FLPInspect")
+            return
+        self.title(f"FLPInspect - {doc.store.file}")
+        doc.materialize()
+        self.touch(doc)
+
+    def open_file(self, file: str):
+        """Opens `file` in a new tab, or selects its tab if already open."""
+        path = pathlib.Path(file).resolve()
+        for doc in self.documents:
+            if doc.store.file == path:
+                self.docs.select(doc)
+                return
+
+        doc = Document(self.docs, EventStore(path), self.sb)
+        doc.etv.show_htips = self.__show_htips.get()
+        doc.etv.editable = self.__editable.get()
+        self.documents.append(doc)
+        self.docs.add(doc, text=path.name)
+        self.docs.select(doc)
+        self.sb.config(text=f"Loading {path.name}...")
+        future = self.pool.submit(doc.store.load, self.verbose)
+        self.after(POLL_INTERVAL, self.__loaded, doc, future)
+
+        # Validation reads the file by itself, no need to wait for the parse
+        doc.validate(self.pool)
+
+        # Mouse hovering in Event View will update status bar
+        self.bind("<Motion>", self.update_status)
+
+    def __loaded(self, doc: Document, future: Future):
+        """Polls till `doc` is parsed, then populates it if it's selected."""
+        if not future.done():
+            self.after(POLL_INTERVAL, self.__loaded, doc, future)
+            return
+
+        name = doc.store.file.name
+        if doc not in self.documents:  # Closed while loading
+            return
+        try:
+            future.result()
+        except Exception as e:
+            # Events couldn't be read either, only validation can help
+            self.console_write(
+                f"\n\nFailed to open {name}: {e}"
+                "\nSee its Validation tab for details.",
+                "ERROR",
+            )
+            doc.failed = True
         else:
-            try:
-                self.project = parser.parse(file)
-            except Exception as e:
-                # * Failsafe mode, only 'Event View' will work
-                self.console.configure(state="normal")
-                self.console.insert(
-                    "end",
-                    "\n\nFailed to parse properly; only events will be shown. "
-                    f"\nException details: {e}",
+            if doc.store.error:
+                self.console_write(
+                    f"\n\nFailed to parse {name} properly; only events will be "
+                    f"shown.\nException details: {doc.store.error}"
+                    "\nSee its Validation tab for details.",
                     "ERROR",
                 )
-                self.console.configure(state="disabled")
-                self.events = parser.get_events(file)
-
-                # Remove extra tabs
-                # * Technically I can still, provide these infos
-                # * but that better be done in PyFLP itself.
-                self.nb.forget(self.cf)
-                self.nb.forget(self.pf)
-                self.nb.forget(self.af)
-            else:
-                self.events = self.project.events
-
-        def clb():
-            """Populate 'Channels' listbox."""
-            for ch in self.project.channels:
-                name = None
-                if ch.name:
-                    name = ch.name
-                elif ch.default_name:
-                    name = ch.default_name
-                self.clb.insert("end", name)
-
-        def plb():
-            """Populate 'Patterns' listbox."""
-            for pat in self.project.patterns:
-                self.plb.insert("end", pat.name)
-
-        def atv():
-            """Populate 'Arrangements' tab treeview."""
-            for arr in self.project.arrangements:
-                arr_iid = self.atv.insert("", "end", text=arr.name, open=True)
-                tm_iid = self.atv.insert(arr_iid, "end", text="TimeMarkers", open=True)
-                for tm in arr.timemarkers:
-                    tmn = (tm.name,)
-                    if tm.name is None:
-                        tmn = f"TimeMarker @ {tm.position}"
-                    self.atv.insert(tm_iid, "end", text=tmn)
-                tr_iid = self.atv.insert(arr_iid, "end", text="Tracks", open=True)
-                for tr in arr.tracks:
-                    trn = (tr.name,)
-                    if tr.name is None:
-                        trn = (f"Track {tr.index}",)
-                    self.atv.insert(tr_iid, "end", text=trn)
-
-        self.populate_etv()
-        if self.project:
-            clb()
-            plb()
-            atv()
-        self.sb.config(text="Ready")
+            doc.loaded = True
+
+        if doc is self.current:
+            self.on_document_changed()
+        status = "Failed to open" if doc.failed else "Loaded"
+        self.sb.config(text=f"{status} {name}")
+
+    def close_document(self, doc: Document):
+        self.documents.remove(doc)
+        self.docs.forget(doc)
+        doc.destroy()
+
+    def file_close(self, _=None):
+        """Command for File -> Close and callback for Ctrl+W accelerator."""
+        doc = self.current
+        if doc:
+            self.close_document(doc)
+
+    def on_close(self):
+        self.pool.shutdown(wait=False)
+        self.destroy()
 
     def file_open(self, _=None):
         """Command for File -> Open and callback for Ctrl+O accelerator.
@@ -375,58 +317,47 @@ class FLPInspector(tk.Tk):
 
         file = tkfiledlg.askopenfilename(
             title="Select an FLP or a ZIP looped package",
-            filetypes=(("FL Studio project", "*.flp"), ("ZIP looped package", "*.zip")),
+            filetypes=(
+                ("FL Studio project", ("*.flp", "*.FLP")),
+                ("ZIP looped package", ("*.zip", "*.ZIP")),
+            ),
         )
 
         if file:
-            # Clear all existing tables and listboxes
-            for i in self.etv.get_children():
-                self.etv.delete(i)
-            for i in self.atv.get_children():
-                self.atv.delete(i)
-            self.clb.delete(0, last=self.clb.size())
-            self.plb.delete(0, last=self.plb.size())
-            self.console.delete("0.0", "end")
-            self.populate(pathlib.Path(file))
-
-            # Update title to include the name of the opened FLP
-            self.title(f"FLPInspect - {file}")
-
-            # Mouse hovering in Event View will update status bar
-            self.bind("<Motion>", self.update_status)
-
-            # Enable save as operation
-            self.m_file.entryconfigure(1, state="normal")
-            self.bind("<Control-s>", self.file_saveas)
+            self.open_file(file)
+
+    def file_open_indexed(self):
+        """Command for File -> Open from index."""
+        if not self.index.exists():
+            tkmsgbox.showerror(
+                "Open from index",
+                f"No index found at {self.index}. "
+                "Create one first with 'flpinspect index <folder>'.",
+            )
+            return
+        QueryDialog(self, Index(self.index), self.open_file)
 
     def file_saveas(self, _=None):
         """Callback for File -> Save As menubutton."""
+        doc = self.current
+        if not (doc and doc.loaded):
+            return
+
         file = tkfiledlg.asksaveasfilename(
             title="Choose the file to save to",
             filetypes=(("FL Studio project", "*.flp"), ("All files", "*.*")),
         )
 
-        if file:
-            for idx, child in enumerate(self.etv.get_children()):
-                try:
-                    value = self.etv.item(child, "values")[2]
-                    ev = self.project.events[idx]
-                    if ev.id >= 208 and ev.id not in DATA_TEXT_EVENTS:
-                        # "(100, 200)" -> b'd\xc8'
-                        buf = bytes(map(int, value.strip("()").split(", ")))
-                    elif ev.id in range(192, 208) or ev.id in DATA_TEXT_EVENTS:
-                        buf = value
-                    elif ev.id <= 192:
-                        arr = value.split("/")
-                        assert len(arr) <= 2
-                        positive_value_idx = 1 if len(arr) == 2 else 0
-                        buf = int(arr[positive_value_idx].strip())
-                    ev.dump(buf)
-                except:
-                    print(ev.id, buf)
-                    raise
-            self.project.save(file)
-        self.sb.config(text=f"Saved to {file}")
+        if not file:
+            return
+
+        try:
+            doc.save_as(file, self.__verify_saves.get())
+        except Exception as e:
+            tkmsgbox.showerror("Save as", f"Failed to save {file}\n\n{e}")
+            self.sb.config(text=f"Failed to save to {file}")
+        else:
+            self.sb.config(text=f"Saved to {file}")
 
     def show_about(self):
         """Help -> About."""
@@ -0,0 +1,87 @@
+"""Dialog to query the project index and open a project from the results."""
+
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List
+
+from .index import Index
+
+
+class QueryDialog(tk.Toplevel):
+    """Searches an `Index` for projects using a plugin or containing an
+    event. Double-clicking a result calls `on_open` with its path."""
+
+    KINDS = ("Plugin", "Event ID")
+
+    def __init__(self, parent, index: Index, on_open: Callable[[str], None]):
+        super().__init__(parent)
+        self.title("Open from index")
+        self.geometry("500x400")
+        self.index = index
+        self.on_open = on_open
+        self.paths: List[str] = []  # Results, in the order they are listed
+
+        form = ttk.Frame(self)
+        form.pack(side="top", fill="x", padx=3, pady=3)
+
+        self.kind = ttk.Combobox(form, values=self.KINDS, state="readonly", width=10)
+        self.kind.current(0)
+        self.kind.bind("<<ComboboxSelected>>", self.on_kind)
+        self.kind.pack(side="left")
+
+        self.query = ttk.Entry(form)
+        self.query.bind("<Return>", self.search)
+        self.query.pack(side="left", fill="x", expand=tk.TRUE, padx=3)
+
+        # Optional value for 'Event ID' queries
+        self.value = ttk.Entry(form, width=12, state="disabled")
+        self.value.bind("<Return>", self.search)
+        self.value.pack(side="left")
+
+        ttk.Button(form, text="Search", command=self.search).pack(side="left", padx=3)
+
+        self.results = tk.Listbox(self, relief="flat", activestyle="none")
+        vsb = ttk.Scrollbar(self, orient="vertical", command=self.results.yview)
+        vsb.pack(side="right", fill="y")
+        self.results.pack(expand=tk.TRUE, fill="both")
+        self.results.configure(yscrollcommand=vsb.set)
+        self.results.bind("<Double-1>", self.open_selected)
+
+        self.query.focus_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def on_kind(self, _=None):
+        state = "normal" if self.kind.get() == "Event ID" else "disabled"
+        self.value.configure(state=state)
+
+    def search(self, _=None):
+        query = self.query.get().strip()
+        self.results.delete(0, "end")
+        self.paths = []
+        if not query:
+            return
+        if self.kind.get() == "Plugin":
+            paths = self.index.with_plugin(query)
+        else:
+            try:
+                event_id = int(query)
+            except ValueError:
+                self.results.insert("end", f"Invalid event ID '{query}'")
+                return
+            value = self.value.get().strip() or None
+            paths = self.index.with_event(event_id, value)
+        self.paths = paths
+        for path in paths:
+            self.results.insert("end", path)
+        if not paths:
+            self.results.insert("end", "No matching projects")
+
+    def open_selected(self, _=None):
+        sel = self.results.curselection()
+        # Messages like "No matching projects" aren't results
+        if sel and sel[0] < len(self.paths):
+            self.on_open(self.paths[sel[0]])
+
+    def close(self):
+        self.index.close()
+        self.destroy()
@@ -0,0 +1,154 @@
+"""
+Reads the raw event stream of an FLP without building any event objects.
+
+Every event is returned exactly as it is stored in the file, including the
+encoding of its size, so that it can be copied elsewhere byte for byte.
+"""
+
+import pathlib
+import struct
+import zipfile
+import zlib
+from typing import BinaryIO, Iterator, NamedTuple, Tuple, Union
+
+from pyflp.utils import DWORD, TEXT, WORD
+
+# FLhd chunk (14 bytes) followed by FLdt magic and chunk length (8 bytes)
+HEADER_SIZE = 22
+
+# Offset of the FLdt chunk length in the file
+CHUNKLEN_OFFSET = 18
+
+
+class TruncatedEventError(EOFError):
+    """An event extends past the end of the file."""
+
+    def __init__(self, index: int, id: int, offset: int, message: str):
+        super().__init__(f"Event {index} (ID {id}) @ {offset}: {message}")
+        self.index = index
+        self.id = id
+        self.offset = offset
+
+
+class Header(NamedTuple):
+    format: int
+    channel_count: int
+    ppq: int
+    chunklen: int
+
+
+class RawEvent(NamedTuple):
+    index: int
+    id: int
+    offset: int
+    raw: bytes  # ID, size (variable sized events only) and data as stored
+    data_offset: int  # Offset of the data in `raw`
+
+    @property
+    def data(self) -> bytes:
+        return self.raw[self.data_offset :]
+
+    @property
+    def size(self) -> int:
+        return len(self.raw)
+
+
+def checksum(id: int, data: bytes) -> int:
+    """CRC32 of an event's ID and data, independent of how its size is encoded."""
+    return zlib.crc32(data, zlib.crc32(bytes((int(id),))))
+
+
+def is_zip(path: Union[str, pathlib.Path]) -> bool:
+    """Whether `path` is of a ZIP looped package, going by its extension."""
+    return pathlib.Path(path).suffix.lower() == ".zip"
+
+
+def zip_member(zp: zipfile.ZipFile) -> str:
+    """Name of the only FLP inside a ZIP looped package.
+
+    Raises:
+        ValueError: If there isn't exactly one.
+    """
+    flps = [name for name in zp.namelist() if name.lower().endswith(".flp")]
+    if len(flps) != 1:
+        raise ValueError(f"Expected a single FLP inside {zp.filename}")
+    return flps[0]
+
+
+def open_flp(path: Union[str, pathlib.Path]) -> BinaryIO:
+    """Opens an FLP or the FLP inside a ZIP looped package for reading."""
+    path = pathlib.Path(path)
+    if is_zip(path):
+        zp = zipfile.ZipFile(str(path), "r")
+        try:
+            name = zip_member(zp)
+        except ValueError:
+            zp.close()
+            raise
+        return zp.open(name, "r")  # type: ignore
+    return open(str(path), "rb")
+
+
+def read_header(f: BinaryIO) -> Header:
+    """Reads the FLhd chunk and the FLdt chunk header."""
+    buf = f.read(HEADER_SIZE)
+    if len(buf) < HEADER_SIZE:
+        raise EOFError("File is too small to be an FLP")
+    magic, hdrlen, format, channel_count, ppq, dtmagic, chunklen = struct.unpack(
+        "<4sIhHH4sI", buf
+    )
+    if magic != b"FLhd" or dtmagic != b"FLdt":
+        raise ValueError("Not an FLP; header chunks are missing")
+    if hdrlen != 6:
+        raise ValueError(f"Unexpected header size {hdrlen}, expected 6")
+    return Header(format, channel_count, ppq, chunklen)
+
+
+def read_varint(f: BinaryIO) -> Tuple[int, bytes]:
+    """Reads a variable length integer, returns its value and its bytes."""
+    value = shift = 0
+    buf = bytearray()
+    while True:
+        b = f.read(1)
+        if not b:
+            raise EOFError("Truncated varint")
+        buf += b
+        value |= (b[0] & 0x7F) << shift
+        shift += 7
+        if not b[0] & 0x80:
+            return value, bytes(buf)
+
+
+def scan(f: BinaryIO, offset: int = HEADER_SIZE) -> Iterator[RawEvent]:
+    """Yields events from `f`, positioned at the start of the event stream,
+    till EOF. Only a single event is held in memory at a time.
+
+    Raises:
+        TruncatedEventError: When an event extends past the end of the file.
+    """
+    index = 0
+    while True:
+        id_ = f.read(1)
+        if not id_:
+            return
+        id = id_[0]
+        if id < WORD:
+            size = 1
+        elif id < DWORD:
+            size = 2
+        elif id < TEXT:
+            size = 4
+        else:
+            try:
+                size, varint = read_varint(f)
+            except EOFError:
+                raise TruncatedEventError(index, id, offset, "truncated size")
+            id_ += varint
+        data = f.read(size)
+        if len(data) < size:
+            raise TruncatedEventError(
+                index, id, offset, f"declares {size} bytes, only {len(data)} left"
+            )
+        yield RawEvent(index, id, offset, id_ + data, len(id_))
+        offset += len(id_) + size
+        index += 1
@@ -0,0 +1,343 @@
+"""
+Local inspection server; FLPInspect's Event View as an HTTP/JSON API.
+
+Projects are loaded into the same `EventStore` used by the GUI and kept in
+an LRU cache, so subsequent requests for a project don't parse it again.
+Requests are served by a bounded pool of worker threads.
+
+Endpoints (all GET, `path` is the path of an FLP or a ZIP looped package):
+    /projects                   Projects currently in the cache.
+    /events?path=&offset=&limit=&id=
+                                A page of events, optionally only ones of `id`.
+    /search?path=&q=&offset=&limit=
+                                A page of events matching `q`, see `EventStore.search`.
+    /event?path=&index=         A single event, with its data decoded.
+"""
+
+import array
+import collections
+import json
+import logging
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from pyflp.event import DataEvent
+
+from .store import EventStore, Row, event_value
+
+log = logging.getLogger(__name__)
+
+# Rough memory taken by an `Event` object itself, besides its data
+EVENT_OVERHEAD = 400
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 5000
+
+# Number of filtered or searched event lists kept, for paging through them
+MAX_RESULTS = 32
+
+
+class ProjectCache:
+    """Thread-safe LRU cache of loaded `EventStore`s.
+
+    A project is loaded again only if its file was modified since.
+
+    Args:
+        max_items: Maximum number of projects to keep.
+        max_bytes: Approximate memory limit for all projects combined.
+            The most recently used project is kept even if it exceeds it.
+    """
+
+    def __init__(self, max_items: int = 16, max_bytes: int = 512 << 20):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.__stores = collections.OrderedDict()  # type: ignore
+        self.__sizes: Dict[Tuple[str, float], int] = {}
+        self.__lock = threading.Lock()
+        self.__loading: Dict[Tuple[str, float], threading.Lock] = {}
+
+        # (path, kind, argument) -> (store, positions of matching events)
+        self.__results = collections.OrderedDict()  # type: ignore
+
+    @staticmethod
+    def sizeof(store: EventStore) -> int:
+        return store.nbytes + EVENT_OVERHEAD * len(store.events)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.__sizes.values())
+
+    def stores(self):
+        with self.__lock:
+            return list(self.__stores.values())
+
+    def get(self, file: pathlib.Path) -> EventStore:
+        """Returns the store of `file`, loading it on a miss.
+
+        Concurrent requests for the same file wait for a single load.
+        """
+        key = (str(file), file.stat().st_mtime)
+        with self.__lock:
+            store = self.__stores.get(key)
+            if store is not None:
+                self.__stores.move_to_end(key)
+                return store
+            loading = self.__loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self.__lock:
+                store = self.__stores.get(key)
+                if store is not None:
+                    return store
+            try:
+                store = EventStore(file).load()
+            except BaseException:
+                with self.__lock:
+                    self.__loading.pop(key, None)
+                raise
+            with self.__lock:
+                # Drop stale versions of the same file
+                for old in [k for k in self.__stores if k[0] == key[0]]:
+                    self.__drop(old)
+                self.__stores[key] = store
+                self.__sizes[key] = self.sizeof(store)
+
+                # Only now, a request arriving in between would load it again
+                self.__loading.pop(key, None)
+                self.__evict()
+        log.info(f"Loaded {store}")
+        return store
+
+    def matches(
+        self, store: EventStore, what: Tuple, find: Callable[[], Iterable[int]]
+    ) -> Sequence[int]:
+        """Positions of the events of `store` matching `what`, e.g. an ID
+        or a search query; `find` finds them on a miss.
+
+        Paging through results asks for the same ones repeatedly, so the
+        most recently used are kept and only the events of a page need
+        to be decoded.
+        """
+        key = (str(store.file),) + what
+        with self.__lock:
+            hit = self.__results.get(key)
+            if hit is not None and hit[0] is store:
+                self.__results.move_to_end(key)
+                return hit[1]
+
+        # Concurrent misses find the same positions, which is harmless
+        positions = array.array("L", find())
+        with self.__lock:
+            self.__results[key] = (store, positions)
+            self.__results.move_to_end(key)
+            while len(self.__results) > MAX_RESULTS:
+                self.__results.popitem(last=False)
+        return positions
+
+    def __drop(self, key: Tuple[str, float]):
+        store = self.__stores.pop(key)
+        del self.__sizes[key]
+        for k in [k for k, v in self.__results.items() if v[0] is store]:
+            del self.__results[k]
+
+    def __evict(self):
+        while len(self.__stores) > 1 and (
+            len(self.__stores) > self.max_items or self.nbytes > self.max_bytes
+        ):
+            key = next(iter(self.__stores))
+            store = self.__stores[key]
+            self.__drop(key)
+            log.info(f"Evicted {store}")
+
+
+def _row_json(row: Row) -> dict:
+    index, id, value = row
+    return {
+        "index": index,
+        "id": int(id),
+        "name": getattr(id, "name", None),
+        "value": value,
+    }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server: "InspectionServer"
+
+    def log_message(self, format, *args):
+        log.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, obj, status: HTTPStatus = HTTPStatus.OK):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        endpoint = getattr(self, f"get_{url.path.strip('/')}", None)
+        if endpoint is None:
+            self.send_json({"error": "No such endpoint"}, HTTPStatus.NOT_FOUND)
+            return
+        try:
+            self.send_json(endpoint())
+        except ValueError as e:
+            self.send_json({"error": str(e)}, HTTPStatus.BAD_REQUEST)
+        except (FileNotFoundError, PermissionError) as e:
+            self.send_json({"error": str(e)}, HTTPStatus.NOT_FOUND)
+        except Exception as e:
+            log.exception("Request failed")
+            self.send_json({"error": str(e)}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    # * Parameters
+    def param(self, name: str, default=None, type=str):
+        value = self.params.get(name)
+        if value is None:
+            if default is None:
+                raise ValueError(f"Missing parameter '{name}'")
+            return default
+        try:
+            return type(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for '{name}': {value!r}")
+
+    def store(self) -> EventStore:
+        file = pathlib.Path(self.param("path")).resolve()
+        root = self.server.root
+        if root is not None and root not in file.parents:
+            raise PermissionError(f"{file} is outside {root}")
+        if not file.is_file():
+            raise FileNotFoundError(f"No such file: {file}")
+        return self.server.cache.get(file)
+
+    def page(self, store: EventStore, positions: Sequence[int]) -> dict:
+        """Decodes the events at `positions` in `store.events` which fall
+        in the page asked for by 'offset' and 'limit'."""
+        offset = self.param("offset", 0, int)
+        limit = min(self.param("limit", DEFAULT_LIMIT, int), MAX_LIMIT)
+        if offset < 0 or limit < 0:
+            raise ValueError("'offset' and 'limit' can't be negative")
+        events = []
+        for pos in positions[offset : offset + limit]:
+            ev = store.events[pos]
+            events.append(_row_json((ev.index, ev.id, event_value(ev, store.unicode))))
+        return {
+            "path": str(store.file),
+            "offset": offset,
+            "limit": limit,
+            "total": len(positions),
+            "events": events,
+        }
+
+    # * Endpoints
+    def get_projects(self):
+        return {
+            "nbytes": self.server.cache.nbytes,
+            "projects": [
+                {
+                    "path": str(s.file),
+                    "events": len(s.events),
+                    "parsed": s.project is not None,
+                    "error": s.error,
+                }
+                for s in self.server.cache.stores()
+            ],
+        }
+
+    def get_events(self):
+        store = self.store()
+        id = self.param("id", -1, int)
+        if id == -1:
+            return self.page(store, range(len(store.events)))
+        positions = self.server.cache.matches(
+            store,
+            ("id", id),
+            lambda: (pos for pos, ev in enumerate(store.events) if ev.id == id),
+        )
+        return self.page(store, positions)
+
+    def get_search(self):
+        store = self.store()
+        q = self.param("q")
+        positions = self.server.cache.matches(store, ("q", q), lambda: store.search(q))
+        return self.page(store, positions)
+
+    def get_event(self):
+        store = self.store()
+        index = self.param("index", type=int)
+        if index not in range(len(store.events)):
+            raise ValueError(f"Event index {index} out of range")
+        ev = store.events[index]
+        obj = _row_json((ev.index, ev.id, event_value(ev, store.unicode)))
+        obj.update(kind=type(ev).__name__, size=ev.size, hex=ev.data.hex())
+        if isinstance(ev, DataEvent):
+            obj["value"] = list(ev.data)
+        return obj
+
+
+class InspectionServer(HTTPServer):
+    """HTTP server dispatching requests to a bounded thread pool.
+
+    Args:
+        address: Host and port to listen on.
+        cache: Cache of loaded projects.
+        workers: Number of threads serving requests.
+        root: If set, only files inside this folder can be opened.
+    """
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        cache: ProjectCache,
+        workers: int = 8,
+        root: Optional[pathlib.Path] = None,
+    ):
+        super().__init__(address, RequestHandler)
+        self.cache = cache
+        self.root = root.resolve() if root else None
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.__process, request, client_address)
+
+    def __process(self, request, client_address):
+        # Same as `socketserver.ThreadingMixIn.process_request_thread`
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int = 8,
+    cache_items: int = 16,
+    cache_mb: int = 512,
+    root: Optional[str] = None,
+):
+    """Runs an `InspectionServer` till interrupted."""
+    cache = ProjectCache(cache_items, cache_mb << 20)
+    server = InspectionServer(
+        (host, port), cache, workers, pathlib.Path(root) if root else None
+    )
+    print(f"Serving on http://{host}:{server.server_port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
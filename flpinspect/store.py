@@ -0,0 +1,180 @@
+"""
+Event store shared by the GUI, the index and the inspection server.
+
+Holds the events and, if it could be parsed, the `Project` of a single FLP
+independent of any widgets, so that views can be destroyed and rebuilt from
+it at any time.
+"""
+
+import pathlib
+import threading
+import zipfile
+from typing import Iterator, List, Optional, Tuple, Union
+
+from pyflp import Parser
+from pyflp.event import Event, ByteEvent, WordEvent, DWordEvent, TextEvent
+from pyflp.event.event import VariableSizedEvent
+from pyflp.project import Project
+from pyflp.utils import FLVersion
+
+from .scanner import is_zip, zip_member
+
+# PyFLP keeps parser state in class attributes (event counters, FL version,
+# text encoding), parsing is serialised through this lock, even when run in
+# worker threads. `TextEvent.uses_unicode` is only ever set under it.
+PARSE_LOCK = threading.Lock()
+
+# Text events except the version are UTF-16 since FL 11.5
+VERSION_ID = 199
+
+Row = Tuple[int, int, str]
+
+
+def event_value(ev: Event, unicode: bool = True) -> str:
+    """The value to display in 'Value' column.
+
+    Args:
+        ev: The event.
+        unicode: Whether text events of the project are UTF-16. PyFLP's
+            `TextEvent.uses_unicode` is global and set by the last parse,
+            so it is never relied upon here; see `EventStore.unicode`.
+    """
+    if isinstance(ev, ByteEvent):
+        v = ev.to_int8()
+        if v < 0:
+            i8 = v
+            u8 = ev.to_uint8()
+            v = f"{i8} / {u8}"
+    elif isinstance(ev, WordEvent):
+        v = ev.to_int16()
+        if v < 0:
+            i16 = v
+            u16 = ev.to_uint16()
+            v = f"{i16} / {u16}"
+    elif isinstance(ev, DWordEvent):
+        v = ev.to_int32()
+        if v < 0:
+            i32 = v
+            u32 = ev.to_uint32()
+            v = f"{i32} / {u32}"
+    elif isinstance(ev, TextEvent):
+        if unicode and ev.id != VERSION_ID:
+            v = TextEvent.as_uf16(ev.data)
+        else:
+            v = TextEvent.as_ascii(ev.data)
+    else:
+        v = str(tuple(ev.data))
+    return v
+
+
+class EventStore:
+    """Events of an FLP and its `Project`, if it could be parsed.
+
+    Args:
+        file: Path to an FLP or a ZIP looped package.
+    """
+
+    def __init__(self, file: Union[str, pathlib.Path]):
+        self.file = pathlib.Path(file)
+        self.project: Optional[Project] = None
+        self.events: List[Event] = []
+
+        # Whether text events are UTF-16, from the version of FL the
+        # project was saved with
+        self.unicode = True
+
+        # Exception details, if parsing failed and only events are available
+        self.error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"EventStore({str(self.file)!r}, {len(self.events)} events)"
+
+    def load(self, verbose: bool = False) -> "EventStore":
+        """Parses the file. Falls back to only collecting events if the
+        `Project` can't be built. Thread-safe; returns self."""
+        with PARSE_LOCK:
+            # Reset what a previous parse of an older project left behind
+            TextEvent.uses_unicode = True
+            parser = Parser(verbose=verbose)
+            if is_zip(self.file):
+                # TODO Parser.get_events for ZIPs
+                with zipfile.ZipFile(str(self.file)) as zp:
+                    self.project = parser.parse_zip(zp, zip_member(zp))
+                self.events = self.project.events
+                self.unicode = self.__uses_unicode()
+                return self
+            try:
+                self.project = parser.parse(self.file)
+            except Exception as e:
+                # * Failsafe mode, only 'Event View' will work
+                self.error = str(e) or type(e).__name__
+                self.project = None
+                self.events = parser.get_events(self.file)
+            else:
+                self.events = self.project.events
+            self.unicode = self.__uses_unicode()
+        return self
+
+    def __uses_unicode(self) -> bool:
+        for ev in self.events:
+            if ev.id == VERSION_ID:
+                try:
+                    return FLVersion(TextEvent.as_ascii(ev.data)).as_float() >= 11.5
+                except (IndexError, ValueError):
+                    break
+        return True
+
+    # Neither of these take `PARSE_LOCK`; they are called from the GUI
+    # thread, which mustn't wait for a parse running in background.
+    def describe(self, ev: Event) -> str:
+        """`repr` of an event of this store, with its text decoded
+        correctly."""
+        if isinstance(ev, TextEvent):
+            base = VariableSizedEvent.__repr__(ev)
+            return f"{base}, String: {event_value(ev, self.unicode)}"
+        return repr(ev)
+
+    def dump(self, ev: Event, value) -> None:
+        """Dumps `value` into an event of this store, encoding text as
+        the project does; same as `TextEvent.dump` otherwise.
+
+        Raises:
+            TypeError: If `value` isn't of the event's type.
+        """
+        if not isinstance(ev, TextEvent):
+            ev.dump(value)
+        elif not isinstance(value, str):
+            raise TypeError(f"Expected an str object; got {type(value)}")
+        elif self.unicode and ev.id != VERSION_ID:
+            ev.data = value.encode("utf-16-le", errors="ignore") + b"\0\0"
+        else:
+            ev.data = value.encode("ascii", errors="ignore") + b"\0"
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the event data held in memory."""
+        return sum(ev.size for ev in self.events)
+
+    def ids(self) -> List[str]:
+        """Distinct event IDs, as shown in the Event View filter."""
+        return sorted({str(ev.id) for ev in self.events}, key=str)
+
+    def rows(self, filter: Optional[str] = None) -> Iterator[Row]:
+        """Index, ID and display value of events; all of them or the ones
+        whose ID (as shown in the Event View filter) is `filter`."""
+        for ev in self.events:
+            if filter is None or str(ev.id) == filter:
+                yield ev.index, ev.id, event_value(ev, self.unicode)
+
+    def search(self, query: str) -> Iterator[int]:
+        """Positions in `events` of the events whose ID is `query` or whose
+        event name or value contains it. Comparison ignores case."""
+        query = query.lower()
+        for pos, (index, id, value) in enumerate(self.rows()):
+            name = getattr(id, "name", "")
+            if (
+                query == str(int(id))
+                or query in name.lower()
+                or query in str(value).lower()
+            ):
+                yield pos
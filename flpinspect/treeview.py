@@ -17,6 +17,7 @@ Godmode treeview:   https://github.com/unodan/TkInter-Treeview-Example-Demo
 import tkinter as tk
 from tkinter import ttk, messagebox
 from functools import partial
+from typing import Set
 
 from .constants import EP_MAX, HTIP_MAX, HTIP_MIN, VALUECOL_WIDTH
 
@@ -28,6 +29,7 @@ class EntryPopup(ttk.Entry):
         self.tv = tv
         self.iid = iid
 
+        self.text = text
         self.insert(0, text)
         self["exportselection"] = False
 
@@ -38,9 +40,11 @@ class EntryPopup(ttk.Entry):
         self.bind("<MouseWheel>", lambda _: self.destroy())
 
     def on_return(self, _=None):
-        values = list(self.tv.item(self.iid, "values"))
-        values[-1] = self.get()
-        self.tv.item(self.iid, values=values)
+        text = self.get()
+        if text != self.text:
+            # `item(..., "values")` converts numeric strings, set the cell as is
+            self.tv.set(self.iid, self.tv["columns"][-1], text)
+            self.tv.edited.add(self.iid)
         self.destroy()
 
     def select_all(self, _):
@@ -103,6 +107,9 @@ class Treeview(ttk.Treeview):
         self.__hid = ""
         self.show_htips = self.editable = True
 
+        # Items whose value was changed through an EntryPopup
+        self.edited: Set[str] = set()
+
     def heading(self, column, sort_by=None, **kwargs):
         """Implements sorting (ascending-descnding ordering)."""
 
@@ -172,9 +179,8 @@ class Treeview(ttk.Treeview):
         if self.show_htips and self.identify_region(event.x, event.y) == "cell":
             self.htip.place_forget()
             row = self.identify_row(event.y)
-            values = self.item(row, "values")
-            if values:
-                text = values[2]
+            if row:
+                text = self.set(row, "#3")
                 if len(text) in range(HTIP_MIN, HTIP_MAX) or self.allow_unsafe:
                     self.place_htip(text, event.x, event.y)
 
@@ -214,7 +220,7 @@ class Treeview(ttk.Treeview):
                 pady = height // 2
 
                 # place Entry popup properly
-                text = self.item(row, "values")[2]
+                text = self.set(row, "#3")
                 yes = True
                 if len(text) >= EP_MAX and not self.allow_unsafe:
                     yes = messagebox.askyesno(
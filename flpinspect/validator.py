@@ -0,0 +1,230 @@
+"""
+Validation of the raw event stream of an FLP.
+
+Works on the bytes of the file through `scanner`, independent of PyFLP's
+object model, so it can point at problems in files which PyFLP fails to
+parse. Findings are yielded as soon as they are found.
+"""
+
+import struct
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from pyflp.flobject import (
+    ArrangementEvent,
+    ChannelEvent,
+    ChannelKind,
+    FilterChannelEvent,
+    InsertEvent,
+    InsertSlotEvent,
+    MiscEvent,
+    PatternEvent,
+    PlaylistEvent,
+    TimeMarkerEvent,
+    TrackEvent,
+)
+from pyflp.flobject.insert.event import InsertParamsEvent
+from pyflp.utils import DATA, DATA_TEXT_EVENTS, TEXT, FLVersion
+
+from .scanner import (
+    HEADER_SIZE,
+    RawEvent,
+    TruncatedEventError,
+    open_flp,
+    read_header,
+    scan,
+)
+
+KNOWN_IDS: Set[int] = {InsertParamsEvent.ID}
+for enum in (
+    ArrangementEvent,
+    ChannelEvent,
+    FilterChannelEvent,
+    InsertEvent,
+    InsertSlotEvent,
+    MiscEvent,
+    PatternEvent,
+    PlaylistEvent,
+    TimeMarkerEvent,
+    TrackEvent,
+):
+    KNOWN_IDS.update(enum.__members__.values())
+
+# Tempo is stored as BPM * 1000; FL Studio allows 10 to 522 BPM
+TEMPO_RANGE = range(10_000, 522_001)
+
+# Highest insert a channel can be routed to
+MAX_INSERT = 126
+
+PLAYLIST_ITEM_SIZE = 32
+
+
+class Finding(NamedTuple):
+    level: str  # "ERROR", "WARNING" or "INFO"; same as `GUIHandler` tags
+    index: Optional[int]  # Index of the event, None for the header
+    offset: int
+    message: str
+
+
+class Validator:
+    """Checks declared sizes, unknown IDs, value ranges and references
+    between channels, patterns and playlist items of an event stream."""
+
+    def __init__(self):
+        self.channel_count = 0
+        self.unicode = True
+        self.channels: Set[int] = set()
+        self.patterns: Set[int] = set()
+
+        # Channel events share IDs with insert slot events which follow
+        # InsertEvent.Parameters; same logic as `Parser.parse`
+        self.in_inserts = False
+
+        # (Event index, offset, reference) to check when all events are seen
+        self.channel_refs: List[Tuple[int, int, int]] = []
+        self.pattern_refs: List[Tuple[int, int, int]] = []
+
+    def run(self, f: BinaryIO) -> Iterator[Finding]:
+        """Validates the FLP in `f` from its start."""
+        try:
+            header = read_header(f)
+        except (EOFError, ValueError) as e:
+            yield Finding("ERROR", None, 0, str(e))
+            return
+        yield from self.check_header(header.format, header.channel_count, header.ppq)
+
+        size = 0
+        try:
+            for rev in scan(f):
+                size += rev.size
+                yield from self.check_event(rev)
+        except TruncatedEventError as e:
+            yield Finding("ERROR", e.index, e.offset, str(e))
+
+        if size != header.chunklen:
+            yield Finding(
+                "ERROR",
+                None,
+                HEADER_SIZE - 4,
+                f"Data chunk length is {header.chunklen}, events take {size} bytes",
+            )
+        yield from self.check_references()
+
+    def check_header(self, format: int, channel_count: int, ppq: int):
+        if format != 0:
+            yield Finding("WARNING", None, 8, f"Unknown file format {format}")
+        if channel_count not in range(1, 1000):
+            yield Finding("ERROR", None, 10, f"Invalid channel count {channel_count}")
+        if not ppq:
+            yield Finding("ERROR", None, 12, "PPQ is 0")
+        self.channel_count = channel_count
+
+    def check_event(self, rev: RawEvent) -> Iterator[Finding]:
+        id, data = rev.id, rev.data
+
+        def finding(level: str, message: str) -> Finding:
+            return Finding(level, rev.index, rev.offset, message)
+
+        if id not in KNOWN_IDS:
+            yield finding("INFO", f"Unknown event ID {id}")
+
+        if id == MiscEvent.Version:
+            text = data.decode("ascii", "replace").rstrip("\0")
+            try:
+                self.unicode = FLVersion(text).as_float() >= 11.5
+            except (IndexError, ValueError):
+                yield finding("ERROR", f"Invalid FL Studio version {text!r}")
+        elif id == MiscEvent.Tempo:
+            tempo = struct.unpack("<I", data)[0]
+            if tempo not in TEMPO_RANGE:
+                yield finding("WARNING", f"Tempo {tempo / 1000} BPM is out of range")
+        elif id == MiscEvent.CurrentPatternNum:
+            pattern = self.word(data)
+            if pattern:
+                self.pattern_refs.append((rev.index, rev.offset, pattern))
+        elif id == InsertEvent.Parameters:
+            self.in_inserts = True
+        elif id == PatternEvent.New:
+            pattern = self.word(data)
+            if pattern == 0:
+                yield finding("WARNING", "Pattern index 0; patterns start from 1")
+            self.patterns.add(pattern)
+        elif id == PlaylistEvent.Events:
+            yield from self.check_playlist(rev)
+        elif not self.in_inserts:
+            if id == ChannelEvent.New:
+                channel = self.word(data)
+                if channel in self.channels:
+                    yield finding("ERROR", f"Channel {channel} is defined again")
+                elif channel >= self.channel_count:
+                    yield finding(
+                        "ERROR",
+                        f"Channel {channel} exceeds the channel count "
+                        f"{self.channel_count} in the header",
+                    )
+                self.channels.add(channel)
+            elif id == ChannelEvent.Kind:
+                if data[0] not in ChannelKind.__members__.values():
+                    yield finding("WARNING", f"Unknown channel kind {data[0]}")
+            elif id == ChannelEvent.TargetInsert:
+                insert = struct.unpack("<b", data)[0]
+                if insert > MAX_INSERT:
+                    yield finding("WARNING", f"Routed to non-existent insert {insert}")
+
+        # Text events except the version are UTF-16 since FL 11.5
+        is_text = id in range(TEXT, DATA) or id in DATA_TEXT_EVENTS
+        if is_text and id != MiscEvent.Version and self.unicode and len(data) % 2:
+            yield finding("WARNING", "Odd length for a UTF-16 string")
+
+    @staticmethod
+    def word(data: bytes) -> int:
+        return struct.unpack("<H", data)[0]
+
+    def check_playlist(self, rev: RawEvent) -> Iterator[Finding]:
+        data = rev.data
+        if len(data) % PLAYLIST_ITEM_SIZE:
+            yield Finding(
+                "ERROR",
+                rev.index,
+                rev.offset,
+                f"Playlist data size {len(data)} isn't a multiple of "
+                f"{PLAYLIST_ITEM_SIZE}",
+            )
+        for pos in range(0, len(data) - PLAYLIST_ITEM_SIZE + 1, PLAYLIST_ITEM_SIZE):
+            base, item = struct.unpack_from("<HH", data, pos + 4)
+            if item <= base:
+                self.channel_refs.append((rev.index, rev.offset, item))
+            else:
+                self.pattern_refs.append((rev.index, rev.offset, item - base))
+
+    def check_references(self) -> Iterator[Finding]:
+        if self.channels and len(self.channels) != self.channel_count:
+            yield Finding(
+                "WARNING",
+                None,
+                10,
+                f"Header declares {self.channel_count} channels, "
+                f"{len(self.channels)} found",
+            )
+
+        # Report every missing reference once per event
+        seen: Set[Tuple[str, int, int]] = set()
+        for kind, refs, valid in (
+            ("channel", self.channel_refs, self.channels),
+            ("pattern", self.pattern_refs, self.patterns),
+        ):
+            for index, offset, ref in refs:
+                if ref in valid or (kind, index, ref) in seen:
+                    continue
+                seen.add((kind, index, ref))
+                yield Finding("ERROR", index, offset, f"Refers to missing {kind} {ref}")
+
+
+def validate(file) -> Iterator[Finding]:
+    """Validates an FLP or the FLP inside a ZIP looped package."""
+    try:
+        f = open_flp(file)
+    except (OSError, ValueError) as e:
+        yield Finding("ERROR", None, 0, str(e))
+        return
+    with f:
+        yield from Validator().run(f)
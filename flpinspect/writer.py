@@ -0,0 +1,140 @@
+"""
+Streaming FLP writer.
+
+Instead of serialising the whole project in memory like `Project.save()`,
+events are copied from the source file one at a time. Only the events whose
+ID or data differ from the in-memory model are re-encoded. Output is written
+to a temporary file next to the destination and renamed over it once it is
+complete (and optionally verified), so a failed save never leaves a partially
+written project behind.
+"""
+
+import logging
+import os
+import pathlib
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Sequence, Union
+
+from pyflp.event import Event
+
+from .scanner import (
+    CHUNKLEN_OFFSET,
+    HEADER_SIZE,
+    checksum,
+    open_flp,
+    read_header,
+    scan,
+)
+
+log = logging.getLogger(__name__)
+
+PathLike = Union[str, pathlib.Path]
+
+
+def _umask() -> int:
+    # There's no way to read the umask without setting it
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _write(src: BinaryIO, dst: BinaryIO, events: Sequence[Event]) -> int:
+    """Streams events from `src` to `dst`, replacing the ones that
+    were modified in `events`. Returns the number of events replaced."""
+    header = src.read(HEADER_SIZE)
+    dst.write(header)
+
+    chunklen = replaced = count = 0
+    for rev in scan(src):
+        count = rev.index + 1
+        if rev.index >= len(events):
+            raise ValueError(f"Source has more events than the project ({len(events)})")
+        ev = events[rev.index]
+        # Both are in memory; a checksum could collide and drop an edit
+        if ev.id == rev.id and ev.data == rev.data:
+            buf = rev.raw
+        else:
+            buf = ev.to_raw()
+            replaced += 1
+        dst.write(buf)
+        chunklen += len(buf)
+    if count != len(events):
+        raise ValueError(f"Source has {count} events, project has {len(events)}")
+
+    dst.seek(CHUNKLEN_OFFSET)
+    dst.write(struct.pack("<I", chunklen))
+    return replaced
+
+
+def verify(file: PathLike, events: Sequence[Event]):
+    """Re-scans `file` and compares the checksum of every event with `events`.
+
+    Raises:
+        ValueError: On the first mismatch found.
+    """
+    with open(str(file), "rb") as f:
+        header = read_header(f)
+        chunklen = count = 0
+        for rev in scan(f):
+            if rev.index >= len(events):
+                raise ValueError(f"Extra event {rev.index} @ {rev.offset}")
+            ev = events[rev.index]
+            if checksum(ev.id, ev.data) != checksum(rev.id, rev.data):
+                raise ValueError(
+                    f"Event {rev.index} @ {rev.offset} doesn't match the project"
+                )
+            chunklen += rev.size
+            count += 1
+    if count != len(events):
+        raise ValueError(f"Saved {count} events, project has {len(events)}")
+    if header.chunklen != chunklen:
+        raise ValueError(
+            f"Chunk length is {header.chunklen}, events take {chunklen} bytes"
+        )
+
+
+def save(
+    source: PathLike,
+    events: Sequence[Event],
+    dest: PathLike,
+    verify_output: bool = False,
+) -> int:
+    """Saves `events` to `dest`, copying unmodified events from `source`.
+
+    Memory usage doesn't depend on the size of the project; only one
+    event is read from `source` at a time.
+
+    Args:
+        source: The FLP (or ZIP looped package) `events` were parsed from.
+        events: Events of the project, ordered by index.
+        dest: Where to save; can be same as `source`.
+        verify_output: Re-scan the output and compare it with `events`
+            before replacing `dest`.
+
+    Returns:
+        The number of events which had to be re-encoded.
+    """
+    dest = pathlib.Path(dest)
+    fd, tmp = tempfile.mkstemp(
+        prefix=f".{dest.name}.", suffix=".tmp", dir=str(dest.parent)
+    )
+    try:
+        with os.fdopen(fd, "w+b") as dst, open_flp(source) as src:
+            replaced = _write(src, dst, events)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if dest.exists():
+            shutil.copymode(str(dest), tmp)
+        else:
+            # mkstemp creates files readable only by the owner
+            os.chmod(tmp, 0o666 & ~_umask())
+        if verify_output:
+            verify(tmp, events)
+        os.replace(tmp, str(dest))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    log.info(f"Saved {dest}; {replaced} of {len(events)} events re-encoded")
+    return replaced
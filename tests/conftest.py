@@ -0,0 +1,29 @@
+import struct
+
+
+def event(id: int, data: bytes) -> bytes:
+    """Encodes an event as FL Studio stores it."""
+    if id < 192:
+        return bytes((id,)) + data
+    size = len(data)
+    varint = bytearray()
+    while True:
+        varint.append((size & 0x7F) | (0x80 if size > 0x7F else 0))
+        size >>= 7
+        if not size:
+            break
+    return bytes((id,)) + bytes(varint) + data
+
+
+def build(
+    *events: bytes, channel_count: int = 1, ppq: int = 96, format: int = 0
+) -> bytes:
+    """An FLP made of `events`, with a correct data chunk length."""
+    data = b"".join(events)
+    return (
+        b"FLhd"
+        + struct.pack("<IhHH", 6, format, channel_count, ppq)
+        + b"FLdt"
+        + struct.pack("<I", len(data))
+        + data
+    )
@@ -0,0 +1,207 @@
+import struct
+
+from flpinspect.scanner import HEADER_SIZE
+from flpinspect.validator import MAX_INSERT, PLAYLIST_ITEM_SIZE, Finding, validate
+
+from conftest import build, event
+
+VERSION = event(199, b"20.8.3.2304\0")
+
+
+def word(value: int) -> bytes:
+    return struct.pack("<H", value)
+
+
+def channel(index: int) -> bytes:
+    return event(64, word(index))  # ChannelEvent.New
+
+
+def pattern(index: int) -> bytes:
+    return event(65, word(index))  # PatternEvent.New
+
+
+def playlist_item(base: int, item: int) -> bytes:
+    item = struct.pack("<iHH", 0, base, item)
+    return item + bytes(PLAYLIST_ITEM_SIZE - len(item))
+
+
+def run(tmp_path, buf: bytes):
+    path = tmp_path / "test.flp"
+    path.write_bytes(buf)
+    return list(validate(path))
+
+
+def messages(findings):
+    return [f.message for f in findings]
+
+
+def test_valid_project(tmp_path):
+    buf = build(
+        VERSION,
+        event(156, struct.pack("<I", 140_000)),  # Tempo
+        channel(0),
+        event(21, bytes((4,))),  # ChannelEvent.Kind
+        event(203, "Lead".encode("utf-16-le") + b"\0\0"),  # ChannelEvent.Name
+        pattern(1),
+        event(67, word(1)),  # CurrentPatternNum
+        event(233, playlist_item(0, 0) + playlist_item(0, 1)),  # Channel and pattern
+    )
+    assert run(tmp_path, buf) == []
+
+
+def test_not_an_flp(tmp_path):
+    assert run(tmp_path, b"FLhd") == [
+        Finding("ERROR", None, 0, "File is too small to be an FLP")
+    ]
+    (finding,) = run(tmp_path, b"RIFF" + bytes(40))
+    assert finding.level == "ERROR" and "header chunks are missing" in finding.message
+
+
+def test_header(tmp_path):
+    findings = run(tmp_path, build(VERSION, channel_count=0, ppq=0, format=5))
+    assert [(f.level, f.offset) for f in findings] == [
+        ("WARNING", 8),
+        ("ERROR", 10),
+        ("ERROR", 12),
+    ]
+
+
+def test_truncated_size(tmp_path):
+    # Size of the text event is a varint whose continuation bit is set
+    buf = build(VERSION) + b"\xc2\x80"
+    findings = run(tmp_path, buf)
+    offset = HEADER_SIZE + len(VERSION)
+    assert findings[0] == Finding(
+        "ERROR", 1, offset, f"Event 1 (ID 194) @ {offset}: truncated size"
+    )
+
+
+def test_truncated_data(tmp_path):
+    buf = build(VERSION, event(156, struct.pack("<I", 140_000)))[:-2]
+    findings = run(tmp_path, buf)
+    assert findings[0].index == 1
+    assert findings[0].offset == HEADER_SIZE + len(VERSION)
+    assert "declares 4 bytes, only 2 left" in findings[0].message
+
+
+def test_chunk_length_mismatch(tmp_path):
+    buf = build(VERSION) + event(9, b"\x01")  # Outside the declared chunk
+    assert run(tmp_path, buf) == [
+        Finding(
+            "ERROR",
+            None,
+            HEADER_SIZE - 4,
+            f"Data chunk length is {len(VERSION)}, events take {len(VERSION) + 2} bytes",
+        )
+    ]
+
+
+def test_unknown_event(tmp_path):
+    (finding,) = run(tmp_path, build(VERSION, event(1, b"\0")))
+    assert finding == Finding(
+        "INFO", 1, HEADER_SIZE + len(VERSION), "Unknown event ID 1"
+    )
+
+
+def test_invalid_version(tmp_path):
+    (finding,) = run(tmp_path, build(event(199, b"twenty\0")))
+    assert finding.level == "ERROR" and finding.index == 0
+    assert finding.message == "Invalid FL Studio version 'twenty'"
+
+
+def test_tempo_out_of_range(tmp_path):
+    for tempo in (9_999, 522_001):
+        (finding,) = run(tmp_path, build(VERSION, event(156, struct.pack("<I", tempo))))
+        assert finding.level == "WARNING" and finding.index == 1
+        assert f"Tempo {tempo / 1000} BPM is out of range" == finding.message
+
+
+def test_duplicate_channel(tmp_path):
+    findings = run(tmp_path, build(VERSION, channel(0), channel(0)))
+    assert messages(findings) == ["Channel 0 is defined again"]
+    assert findings[0].index == 2
+
+
+def test_channel_exceeds_count(tmp_path):
+    findings = run(tmp_path, build(VERSION, channel(0), channel(1)))
+    assert messages(findings) == [
+        "Channel 1 exceeds the channel count 1 in the header",
+        "Header declares 1 channels, 2 found",
+    ]
+
+
+def test_channel_count_mismatch(tmp_path):
+    findings = run(tmp_path, build(VERSION, channel(0), channel_count=2))
+    assert findings == [
+        Finding("WARNING", None, 10, "Header declares 2 channels, 1 found")
+    ]
+
+
+def test_channel_kind_and_insert(tmp_path):
+    buf = build(
+        VERSION,
+        channel(0),
+        event(21, bytes((9,))),  # ChannelEvent.Kind
+        event(22, struct.pack("<b", MAX_INSERT + 1)),  # ChannelEvent.TargetInsert
+    )
+    assert messages(run(tmp_path, buf)) == [
+        "Unknown channel kind 9",
+        f"Routed to non-existent insert {MAX_INSERT + 1}",
+    ]
+
+
+def test_insert_slot_events_are_not_channels(tmp_path):
+    # Insert slot events share IDs with channel events; 21 isn't a kind here
+    buf = build(VERSION, channel(0), event(236, bytes(8)), event(21, bytes((9,))))
+    assert run(tmp_path, buf) == []
+
+
+def test_pattern_index_zero(tmp_path):
+    findings = run(tmp_path, build(VERSION, pattern(0)))
+    assert messages(findings) == ["Pattern index 0; patterns start from 1"]
+
+
+def test_missing_references(tmp_path):
+    buf = build(
+        VERSION,
+        channel(0),
+        pattern(1),
+        event(67, word(3)),  # CurrentPatternNum
+        # Channel 0, channel 5 twice, pattern 2 (item - base)
+        event(
+            233,
+            playlist_item(5, 0)
+            + playlist_item(5, 5)
+            + playlist_item(5, 5)
+            + playlist_item(5, 7),
+        ),
+    )
+    findings = run(tmp_path, buf)
+    assert messages(findings) == [
+        "Refers to missing channel 5",
+        "Refers to missing pattern 3",
+        "Refers to missing pattern 2",
+    ]
+    assert [f.index for f in findings] == [4, 3, 4]
+
+
+def test_playlist_size(tmp_path):
+    buf = build(VERSION, event(233, playlist_item(0, 0) + bytes(3)))
+    findings = run(tmp_path, buf)
+    assert findings[0].message == (
+        f"Playlist data size {PLAYLIST_ITEM_SIZE + 3} isn't a multiple of "
+        f"{PLAYLIST_ITEM_SIZE}"
+    )
+
+
+def test_odd_length_utf16(tmp_path):
+    title = event(194, b"abc")  # MiscEvent.Title
+    findings = run(tmp_path, build(VERSION, title))
+    assert findings == [
+        Finding(
+            "WARNING", 1, HEADER_SIZE + len(VERSION), "Odd length for a UTF-16 string"
+        )
+    ]
+
+    # Text of projects older than FL 11.5 is ASCII
+    assert run(tmp_path, build(event(199, b"11.0.0\0"), title)) == []
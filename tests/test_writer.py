@@ -0,0 +1,83 @@
+import struct
+
+import pytest
+
+from flpinspect import writer
+from flpinspect.scanner import HEADER_SIZE, TruncatedEventError, open_flp, read_header
+from flpinspect.store import EventStore
+
+from conftest import build, event
+
+
+@pytest.fixture
+def flp(tmp_path):
+    """A small FLP with byte, word, dword, text and data events."""
+    events = (
+        event(199, b"20.8.3.2304\0"),  # Version
+        event(156, struct.pack("<I", 140_000)),  # Tempo
+        event(194, "Title".encode("utf-16-le") + b"\0\0"),  # Title
+        event(9, b"\x01"),  # LoopActive
+        event(67, struct.pack("<H", 1)),  # CurrentPatternNum
+        event(250, bytes(range(10))),  # Unknown data event
+    )
+    path = tmp_path / "test.flp"
+    path.write_bytes(build(*events))
+    return path
+
+
+def load(path):
+    return EventStore(path).load()
+
+
+def test_unmodified_copy_is_identical(flp, tmp_path):
+    dest = tmp_path / "copy.flp"
+    assert writer.save(flp, load(flp).events, dest, verify_output=True) == 0
+    assert dest.read_bytes() == flp.read_bytes()
+
+
+def test_resized_text_event(flp, tmp_path):
+    store = load(flp)
+    title = next(ev for ev in store.events if ev.id == 194)
+    store.dump(title, "A title long enough for its size to take two bytes" * 2)
+
+    dest = tmp_path / "resized.flp"
+    assert writer.save(flp, store.events, dest, verify_output=True) == 1
+    saved = load(dest)
+    assert [ev.data for ev in saved.events] == [ev.data for ev in store.events]
+
+
+def test_chunk_length_is_patched(flp, tmp_path):
+    store = load(flp)
+    title = next(ev for ev in store.events if ev.id == 194)
+    store.dump(title, "")
+
+    dest = tmp_path / "shrunk.flp"
+    writer.save(flp, store.events, dest)
+    with open_flp(dest) as f:
+        header = read_header(f)
+    assert header.chunklen == dest.stat().st_size - HEADER_SIZE
+    assert dest.stat().st_size < flp.stat().st_size
+
+
+def test_fewer_source_events_than_project(flp, tmp_path):
+    store = load(flp)
+    events = store.events + [store.events[-1]]
+    dest = tmp_path / "dest.flp"
+    dest.write_bytes(b"untouched")
+    with pytest.raises(ValueError):
+        writer.save(flp, events, dest)
+    assert dest.read_bytes() == b"untouched"
+    assert set(tmp_path.iterdir()) == {flp, dest}  # Temporary file is removed
+
+
+def test_truncated_source(flp, tmp_path):
+    events = load(flp).events
+    truncated = tmp_path / "truncated.flp"
+    truncated.write_bytes(flp.read_bytes()[:-3])
+    dest = tmp_path / "dest.flp"
+    dest.write_bytes(b"untouched")
+    with pytest.raises(TruncatedEventError) as e:
+        writer.save(truncated, events, dest)
+    assert e.value.index == len(events) - 1
+    assert dest.read_bytes() == b"untouched"
+    assert set(tmp_path.iterdir()) == {flp, truncated, dest}